@@ -66,6 +66,13 @@ class File:
         """Read the entire content of the file"""
         ...
 
+    def view(self, start: int = 0, end: Optional[int] = None) -> memoryview:
+        """Zero-copy read-only view of the content, optionally sliced
+
+        The view is a snapshot: later writes to the file are not reflected.
+        """
+        ...
+
     def write(self, content: bytes) -> None:
         """Write content to the file, replacing existing content"""
         ...
@@ -100,6 +107,14 @@ class Directory:
         """The children of this directory"""
         ...
 
+    def __len__(self) -> int:
+        """Number of direct children"""
+        ...
+
+    def __bool__(self) -> bool:
+        """Always True, even for an empty directory"""
+        ...
+
     def __repr__(self) -> str: ...
 
 class Symlink:
@@ -151,13 +166,18 @@ class MemFS:
         """
         ...
 
-    def create_dir(self, path: str, mode: int = 0o755) -> Directory:
+    def create_dir(
+        self, path: str, mode: int = 0o755, *, expected_entries: int = 0
+    ) -> Directory:
         """
         Create a directory in the filesystem
 
         Args:
             path: The path where the directory should be created
             mode: Directory permissions (default: 0o755)
+            expected_entries: Number of entries to reserve room for up front,
+                avoiding rehashes while the directory is populated. Only a
+                hint: at most 65536 entries are reserved (default: 0)
 
         Returns:
             The created Directory object
@@ -292,13 +312,24 @@ class MemFS:
         """
         ...
 
-    def mount(self, mount_point: str, allow_other: bool = False) -> MountHandle:
+    def mount(
+        self,
+        mount_point: str,
+        allow_other: bool = False,
+        writeback_cache: bool = False,
+        max_write: Optional[int] = None,
+    ) -> MountHandle:
         """
         Mount the filesystem at the given path
 
         Args:
             mount_point: The path where the filesystem should be mounted
             allow_other: Whether to allow other users to access the mount
+            writeback_cache: Let the kernel batch writes in its page cache.
+                Python-side changes may not be visible through the mount
+                while the kernel holds cached pages for a file.
+            max_write: Largest single write request in bytes (kernel
+                default if None)
 
         Returns:
             A MountHandle that can be used as a context manager
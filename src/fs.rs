@@ -1,38 +1,29 @@
-use crate::tree::{FileKind, InodeTable, NodeRef, PyDirectory, PyFile, PySymlink};
+use crate::tree::{FileKind, HotAttr, Ino, InodeTable, NodeRef, PyDirectory, PyFile, PySymlink};
 use fuser::{
-    FileAttr as FuserAttr, FileType, Filesystem, ReplyAttr, ReplyCreate, ReplyData, ReplyDirectory,
-    ReplyEntry, ReplyOpen, ReplyWrite, Request, TimeOrNow,
+    FileAttr as FuserAttr, FileType, Filesystem, KernelConfig, ReplyAttr, ReplyCreate, ReplyData,
+    ReplyDirectory, ReplyEntry, ReplyOpen, ReplyWrite, Request, TimeOrNow, consts,
 };
 use libc::{EEXIST, EINVAL, EISDIR, ENOENT, ENOTDIR, ENOTEMPTY};
 use pyo3::prelude::*;
-use pyo3::types::PyBytes;
+use rustc_hash::FxHashMap;
+use smol_str::SmolStr;
 use std::ffi::OsStr;
+use std::os::raw::c_int;
 use std::sync::Arc;
-use std::time::{Duration, SystemTime, UNIX_EPOCH};
+use std::time::{Duration, SystemTime};
 
 const TTL: Duration = Duration::from_secs(1);
 
-fn system_time_to_timespec(st: SystemTime) -> (i64, u32) {
-    match st.duration_since(UNIX_EPOCH) {
-        Ok(d) => (d.as_secs() as i64, d.subsec_nanos()),
-        Err(_) => (0, 0),
-    }
-}
-
+#[inline]
 fn to_fuser_attr(attr: &crate::tree::FileAttr) -> FuserAttr {
-    let (atime_secs, atime_nsecs) = system_time_to_timespec(attr.atime);
-    let (mtime_secs, mtime_nsecs) = system_time_to_timespec(attr.mtime);
-    let (ctime_secs, ctime_nsecs) = system_time_to_timespec(attr.ctime);
-    let (crtime_secs, crtime_nsecs) = system_time_to_timespec(attr.crtime);
-
     FuserAttr {
         ino: attr.ino,
         size: attr.size,
         blocks: attr.blocks,
-        atime: UNIX_EPOCH + Duration::new(atime_secs as u64, atime_nsecs),
-        mtime: UNIX_EPOCH + Duration::new(mtime_secs as u64, mtime_nsecs),
-        ctime: UNIX_EPOCH + Duration::new(ctime_secs as u64, ctime_nsecs),
-        crtime: UNIX_EPOCH + Duration::new(crtime_secs as u64, crtime_nsecs),
+        atime: attr.atime,
+        mtime: attr.mtime,
+        ctime: attr.ctime,
+        crtime: attr.crtime,
         kind: match attr.kind {
             FileKind::File => FileType::RegularFile,
             FileKind::Directory => FileType::Directory,
@@ -48,18 +39,133 @@ fn to_fuser_attr(attr: &crate::tree::FileAttr) -> FuserAttr {
     }
 }
 
+/// Kernel-side options negotiated during the FUSE `init` handshake
+#[derive(Clone, Copy, Debug, Default)]
+pub struct KernelTuning {
+    /// Let the kernel buffer writes in its page cache and flush them in
+    /// large batches. Python-side changes to a file may not be visible
+    /// through the mount while the kernel still holds cached pages for it.
+    pub writeback_cache: bool,
+    /// Largest single write request, in bytes (kernel default if unset)
+    pub max_write: Option<u32>,
+}
+
+/// How many times this session has handed each inode to the kernel
+///
+/// The kernel keeps an inode number alive until it has `forget`-ed every
+/// lookup of it. Each inode with a non-zero count is pinned in the table so
+/// its slot is not reused for a new node in the meantime.
+#[derive(Default)]
+struct LookupCounts(FxHashMap<Ino, u64>);
+
+impl LookupCounts {
+    /// Record one lookup of `ino` sent to the kernel in an entry reply
+    fn add(&mut self, inodes: &InodeTable, ino: Ino) {
+        let count = self.0.entry(ino).or_insert(0);
+        if *count == 0 {
+            inodes.pin(ino);
+        }
+        *count += 1;
+    }
+
+    /// Drop `nlookup` lookups of `ino`, unpinning it once none are left;
+    /// returns whether the kernel is now done with the inode
+    fn forget(&mut self, inodes: &parking_lot::RwLock<InodeTable>, ino: Ino, nlookup: u64) -> bool {
+        let Some(count) = self.0.get_mut(&ino) else {
+            return false;
+        };
+        *count = count.saturating_sub(nlookup);
+        if *count > 0 {
+            return false;
+        }
+        self.0.remove(&ino);
+        // Most forgotten inodes still exist, so the read lock is enough
+        let vacated = inodes.read().unpin(ino);
+        if vacated {
+            inodes.write().free_slot(ino);
+        }
+        true
+    }
+}
+
+/// Account for a change a session made to a file's contents
+///
+/// The kernel applies its own writes and truncations to its cached pages, so
+/// those stay current, but only if they were current beforehand.
+fn note_own_change(cached_versions: &mut FxHashMap<Ino, u64>, ino: Ino, before: u64, after: u64) {
+    if let Some(cached) = cached_versions.get_mut(&ino)
+        && *cached == before
+    {
+        *cached = after;
+    }
+}
+
 /// The FUSE filesystem implementation that wraps the Python-owned tree
 pub struct MemFs {
-    pub(crate) inodes: Arc<parking_lot::Mutex<InodeTable>>,
+    pub(crate) inodes: Arc<parking_lot::RwLock<InodeTable>>,
+    tuning: KernelTuning,
+    lookups: LookupCounts,
+    /// `PyFile::version` of each file as this session's kernel page cache
+    /// holds it; recorded per session because several mounts can share a
+    /// table and each kernel mount has its own cache
+    cached_versions: FxHashMap<Ino, u64>,
 }
 
 impl MemFs {
-    pub fn new(inodes: Arc<parking_lot::Mutex<InodeTable>>) -> Self {
-        Self { inodes }
+    pub fn new(inodes: Arc<parking_lot::RwLock<InodeTable>>, tuning: KernelTuning) -> Self {
+        Self {
+            inodes,
+            tuning,
+            lookups: LookupCounts::default(),
+            cached_versions: FxHashMap::default(),
+        }
+    }
+}
+
+impl Drop for MemFs {
+    /// The table outlives the session, so release whatever the kernel never
+    /// got to forget before it went away
+    fn drop(&mut self) {
+        if self.lookups.0.is_empty() {
+            return;
+        }
+        let mut inodes = self.inodes.write();
+        for (ino, _) in self.lookups.0.drain() {
+            if inodes.unpin(ino) {
+                inodes.free_slot(ino);
+            }
+        }
     }
 }
 
 impl Filesystem for MemFs {
+    fn init(&mut self, _req: &Request, config: &mut KernelConfig) -> Result<(), c_int> {
+        if let Some(max_write) = self.tuning.max_write
+            && let Err(nearest) = config.set_max_write(max_write)
+        {
+            log::warn!("max_write {} not supported, using {}", max_write, nearest);
+            let _ = config.set_max_write(nearest);
+        }
+
+        // Keep more requests in flight before the kernel starts throttling
+        // readers, and let it read ahead in 128 KiB windows.
+        let _ = config.set_max_background(64);
+        let _ = config.set_congestion_threshold(48);
+        if let Err(nearest) = config.set_max_readahead(128 * 1024) {
+            let _ = config.set_max_readahead(nearest);
+        }
+
+        if self.tuning.writeback_cache
+            && config
+                .add_capabilities(consts::FUSE_WRITEBACK_CACHE)
+                .is_err()
+        {
+            log::warn!("Kernel does not support the FUSE writeback cache");
+        }
+
+        Ok(())
+    }
+
     fn lookup(&mut self, _req: &Request, parent: u64, name: &OsStr, reply: ReplyEntry) {
         let name = match name.to_str() {
             Some(n) => n,
@@ -69,27 +175,33 @@ impl Filesystem for MemFs {
             }
         };
 
-        Python::attach(|py| {
-            let inodes = self.inodes.lock();
-            if let Some(ino) = inodes.lookup(py, parent, name)
-                && let Some(attr) = inodes.getattr(py, ino)
-            {
-                reply.entry(&TTL, &to_fuser_attr(&attr), 0);
-                return;
-            }
-            reply.error(ENOENT);
+        // Reply after releasing the GIL and table lock; only the lookup needs them
+        let attr = Python::attach(|py| {
+            let inodes = self.inodes.read();
+            let attr = inodes
+                .lookup(py, parent, name)
+                .and_then(|ino| inodes.getattr(py, ino))?;
+            self.lookups.add(&inodes, attr.ino);
+            Some(attr)
         });
+        match attr {
+            Some(attr) => reply.entry(&TTL, &to_fuser_attr(&attr), 0),
+            None => reply.error(ENOENT),
+        }
+    }
+
+    fn forget(&mut self, _req: &Request, ino: u64, nlookup: u64) {
+        if self.lookups.forget(&self.inodes, ino, nlookup) {
+            self.cached_versions.remove(&ino);
+        }
     }
 
     fn getattr(&mut self, _req: &Request, ino: u64, _fh: Option<u64>, reply: ReplyAttr) {
-        Python::attach(|py| {
-            let inodes = self.inodes.lock();
-            if let Some(attr) = inodes.getattr(py, ino) {
-                reply.attr(&TTL, &to_fuser_attr(&attr));
-            } else {
-                reply.error(ENOENT);
-            }
-        });
+        let attr = Python::attach(|py| self.inodes.read().getattr(py, ino));
+        match attr {
+            Some(attr) => reply.attr(&TTL, &to_fuser_attr(&attr)),
+            None => reply.error(ENOENT),
+        }
     }
 
     fn setattr(
@@ -111,27 +223,26 @@ impl Filesystem for MemFs {
         reply: ReplyAttr,
     ) {
         Python::attach(|py| {
-            let inodes = self.inodes.lock();
+            let inodes = self.inodes.read();
 
             // Handle truncation
             if let Some(new_size) = size
                 && let Some(file_py) = inodes.get_file(ino)
             {
                 let mut file = file_py.borrow_mut(py);
-                if file.truncate(py, new_size as usize).is_err() {
-                    reply.error(EINVAL);
-                    return;
-                }
+                let before = file.version;
+                file.truncate(py, new_size as usize);
+                note_own_change(&mut self.cached_versions, ino, before, file.version);
             }
 
             // Handle mode change
             if let Some(new_mode) = mode {
                 match inodes.get(ino) {
                     Some(NodeRef::File(f)) => {
-                        f.borrow_mut(py).mode = (new_mode & 0o7777) as u16;
+                        f.borrow_mut(py).attr.perm = (new_mode & 0o7777) as u16;
                     }
                     Some(NodeRef::Dir(d)) => {
-                        d.borrow_mut(py).mode = (new_mode & 0o7777) as u16;
+                        d.borrow_mut(py).attr.perm = (new_mode & 0o7777) as u16;
                     }
                     Some(NodeRef::Symlink(_)) => {
                         // Symlinks don't have mode - ignore
@@ -153,37 +264,20 @@ impl Filesystem for MemFs {
                     }
                 };
 
-                match inodes.get(ino) {
-                    Some(NodeRef::File(f)) => {
-                        let mut file = f.borrow_mut(py);
-                        if let Some(t) = atime {
-                            file.atime = resolve_time(t);
-                        }
-                        if let Some(t) = mtime {
-                            file.mtime = resolve_time(t);
-                        }
-                        file.ctime = now;
+                let apply = |attr: &mut HotAttr| {
+                    if let Some(t) = atime {
+                        attr.atime = resolve_time(t);
                     }
-                    Some(NodeRef::Dir(d)) => {
-                        let mut dir = d.borrow_mut(py);
-                        if let Some(t) = atime {
-                            dir.atime = resolve_time(t);
-                        }
-                        if let Some(t) = mtime {
-                            dir.mtime = resolve_time(t);
-                        }
-                        dir.ctime = now;
-                    }
-                    Some(NodeRef::Symlink(s)) => {
-                        let mut sym = s.borrow_mut(py);
-                        if let Some(t) = atime {
-                            sym.atime = resolve_time(t);
-                        }
-                        if let Some(t) = mtime {
-                            sym.mtime = resolve_time(t);
-                        }
-                        sym.ctime = now;
+                    if let Some(t) = mtime {
+                        attr.mtime = resolve_time(t);
                     }
+                    attr.ctime = now;
+                };
+
+                match inodes.get(ino) {
+                    Some(NodeRef::File(f)) => apply(&mut f.borrow_mut(py).attr),
+                    Some(NodeRef::Dir(d)) => apply(&mut d.borrow_mut(py).attr),
+                    Some(NodeRef::Symlink(s)) => apply(&mut s.borrow_mut(py).attr),
                     None => {
                         reply.error(ENOENT);
                         return;
@@ -211,10 +305,10 @@ impl Filesystem for MemFs {
         reply: ReplyData,
     ) {
         Python::attach(|py| {
-            let inodes = self.inodes.lock();
+            let inodes = self.inodes.read();
             if let Some(file_py) = inodes.get_file(ino) {
                 let file = file_py.borrow(py);
-                let content = file.content.bind(py).as_bytes();
+                let content = file.data.as_slice(py);
                 let start = offset as usize;
                 if start >= content.len() {
                     reply.data(&[]);
@@ -240,34 +334,20 @@ impl Filesystem for MemFs {
         _lock_owner: Option<u64>,
         reply: ReplyWrite,
     ) {
-        Python::attach(|py| {
-            let inodes = self.inodes.lock();
-            if let Some(file_py) = inodes.get_file(ino) {
-                let mut file = file_py.borrow_mut(py);
-                let current = file.content.bind(py).as_bytes().to_vec();
-                let offset = offset as usize;
-
-                // Extend if necessary
-                let needed_size = offset + data.len();
-                let mut new_content = if needed_size > current.len() {
-                    let mut v = current;
-                    v.resize(needed_size, 0);
-                    v
-                } else {
-                    current
-                };
-
-                // Write the data
-                new_content[offset..offset + data.len()].copy_from_slice(data);
-                file.content = PyBytes::new(py, &new_content).into();
-                file.mtime = SystemTime::now();
-                file.ctime = SystemTime::now();
-
-                reply.written(data.len() as u32);
-            } else {
-                reply.error(ENOENT);
-            }
+        // The payload is copied straight from fuser's request buffer into
+        // the file; the reply is sent after releasing the GIL and table lock
+        let written = Python::attach(|py| {
+            let inodes = self.inodes.read();
+            let mut file = inodes.get_file(ino)?.borrow_mut(py);
+            let before = file.version;
+            file.write_at(py, offset as usize, data);
+            note_own_change(&mut self.cached_versions, ino, before, file.version);
+            Some(data.len() as u32)
         });
+        match written {
+            Some(n) => reply.written(n),
+            None => reply.error(ENOENT),
+        }
     }
 
     fn readdir(
@@ -279,16 +359,20 @@ impl Filesystem for MemFs {
         mut reply: ReplyDirectory,
     ) {
         Python::attach(|py| {
-            let inodes = self.inodes.lock();
+            let inodes = self.inodes.read();
 
             if let Some(dir_py) = inodes.get_dir(ino) {
                 let dir = dir_py.borrow(py);
-                let mut entries: Vec<(u64, FileType, String)> = vec![
-                    (ino, FileType::Directory, ".".to_string()),
-                    (dir.parent_ino, FileType::Directory, "..".to_string()),
+                let mut entries: Vec<(u64, FileType, SmolStr)> = vec![
+                    (ino, FileType::Directory, SmolStr::new_static(".")),
+                    (
+                        dir.parent_ino,
+                        FileType::Directory,
+                        SmolStr::new_static(".."),
+                    ),
                 ];
 
-                for (name, &child_ino) in &dir.children {
+                for (name, child_ino) in dir.children.iter() {
                     let kind = match inodes.get(child_ino) {
                         Some(NodeRef::File(_)) => FileType::RegularFile,
                         Some(NodeRef::Dir(_)) => FileType::Directory,
@@ -300,7 +384,7 @@ impl Filesystem for MemFs {
 
                 for (i, (child_ino, kind, name)) in entries.iter().enumerate().skip(offset as usize)
                 {
-                    if reply.add(*child_ino, (i + 1) as i64, *kind, name) {
+                    if reply.add(*child_ino, (i + 1) as i64, *kind, name.as_str()) {
                         break;
                     }
                 }
@@ -330,7 +414,7 @@ impl Filesystem for MemFs {
         };
 
         Python::attach(|py| {
-            let mut inodes = self.inodes.lock();
+            let mut inodes = self.inodes.write();
 
             // Check if name already exists
             if inodes.lookup(py, parent, name).is_some() {
@@ -339,18 +423,17 @@ impl Filesystem for MemFs {
             }
 
             // Create the file
-            match PyFile::new(py, name.to_string(), None, (mode & 0o7777) as u16) {
-                Ok(file) => match Py::new(py, file) {
-                    Ok(file_py) => match inodes.insert_file(py, parent, file_py) {
-                        Ok(ino) => {
-                            if let Some(attr) = inodes.getattr(py, ino) {
-                                reply.created(&TTL, &to_fuser_attr(&attr), 0, 0, 0);
-                            } else {
-                                reply.error(ENOENT);
-                            }
+            let file = PyFile::new(name, None, (mode & 0o7777) as u16);
+            match Py::new(py, file) {
+                Ok(file_py) => match inodes.insert_file(py, parent, file_py) {
+                    Ok(ino) => {
+                        if let Some(attr) = inodes.getattr(py, ino) {
+                            self.lookups.add(&inodes, ino);
+                            reply.created(&TTL, &to_fuser_attr(&attr), 0, 0, 0);
+                        } else {
+                            reply.error(ENOENT);
                         }
-                        Err(_) => reply.error(EINVAL),
-                    },
+                    }
                     Err(_) => reply.error(EINVAL),
                 },
                 Err(_) => reply.error(EINVAL),
@@ -376,7 +459,7 @@ impl Filesystem for MemFs {
         };
 
         Python::attach(|py| {
-            let mut inodes = self.inodes.lock();
+            let mut inodes = self.inodes.write();
 
             // Check if name already exists
             if inodes.lookup(py, parent, name).is_some() {
@@ -385,11 +468,12 @@ impl Filesystem for MemFs {
             }
 
             // Create the directory
-            let dir = PyDirectory::new(name.to_string(), (mode & 0o7777) as u16);
+            let dir = PyDirectory::new(name, (mode & 0o7777) as u16);
             match Py::new(py, dir) {
                 Ok(dir_py) => match inodes.insert_dir(py, parent, dir_py) {
                     Ok(ino) => {
                         if let Some(attr) = inodes.getattr(py, ino) {
+                            self.lookups.add(&inodes, ino);
                             reply.entry(&TTL, &to_fuser_attr(&attr), 0);
                         } else {
                             reply.error(ENOENT);
@@ -412,7 +496,7 @@ impl Filesystem for MemFs {
         };
 
         Python::attach(|py| {
-            let mut inodes = self.inodes.lock();
+            let mut inodes = self.inodes.write();
 
             if let Some(ino) = inodes.lookup(py, parent, name) {
                 // Make sure it's a file, not a directory
@@ -441,7 +525,7 @@ impl Filesystem for MemFs {
         };
 
         Python::attach(|py| {
-            let mut inodes = self.inodes.lock();
+            let mut inodes = self.inodes.write();
 
             if let Some(ino) = inodes.lookup(py, parent, name) {
                 // Make sure it's a directory
@@ -473,10 +557,19 @@ impl Filesystem for MemFs {
     }
 
     fn open(&mut self, _req: &Request, ino: u64, _flags: i32, reply: ReplyOpen) {
-        Python::attach(|_py| {
-            let inodes = self.inodes.lock();
-            if inodes.get_file(ino).is_some() {
-                reply.opened(0, 0);
+        Python::attach(|py| {
+            let inodes = self.inodes.read();
+            if let Some(file_py) = inodes.get_file(ino) {
+                // Let the kernel keep serving repeat reads from its page cache
+                // unless the contents changed since this session last opened
+                // the file, from Python or through another mount
+                let version = file_py.borrow(py).version;
+                let flags = if self.cached_versions.insert(ino, version) == Some(version) {
+                    consts::FOPEN_KEEP_CACHE
+                } else {
+                    0
+                };
+                reply.opened(0, flags);
             } else {
                 reply.error(ENOENT);
             }
@@ -497,14 +590,13 @@ impl Filesystem for MemFs {
     }
 
     fn opendir(&mut self, _req: &Request, ino: u64, _flags: i32, reply: ReplyOpen) {
-        Python::attach(|_py| {
-            let inodes = self.inodes.lock();
-            if inodes.get_dir(ino).is_some() {
-                reply.opened(0, 0);
-            } else {
-                reply.error(ENOENT);
-            }
-        });
+        // Only the inode table is consulted, so skip attaching to Python
+        let inodes = self.inodes.read();
+        if inodes.get_dir(ino).is_some() {
+            reply.opened(0, 0);
+        } else {
+            reply.error(ENOENT);
+        }
     }
 
     fn releasedir(
@@ -544,7 +636,7 @@ impl Filesystem for MemFs {
         };
 
         Python::attach(|py| {
-            let mut inodes = self.inodes.lock();
+            let mut inodes = self.inodes.write();
 
             // Find the source inode
             let ino = match inodes.lookup(py, parent, name) {
@@ -555,8 +647,10 @@ impl Filesystem for MemFs {
                 }
             };
 
-            // Check if destination exists - if so, remove it first
-            if let Some(existing_ino) = inodes.lookup(py, newparent, newname) {
+            // Check whether an existing destination may be replaced
+            if let Some(existing_ino) = inodes.lookup(py, newparent, newname)
+                && existing_ino != ino
+            {
                 // Can't overwrite directory with file or vice versa
                 let src_is_dir = matches!(inodes.get(ino), Some(NodeRef::Dir(_)));
                 let dst_is_dir = matches!(inodes.get(existing_ino), Some(NodeRef::Dir(_)));
@@ -574,15 +668,9 @@ impl Filesystem for MemFs {
                     reply.error(ENOTEMPTY);
                     return;
                 }
-
-                // Remove the destination
-                if inodes.remove(py, existing_ino).is_err() {
-                    reply.error(EINVAL);
-                    return;
-                }
             }
 
-            // Perform the rename
+            // Perform the rename; this replaces the destination entry, if any
             if inodes.rename(py, parent, name, newparent, newname).is_err() {
                 reply.error(EINVAL);
                 return;
@@ -616,7 +704,7 @@ impl Filesystem for MemFs {
         };
 
         Python::attach(|py| {
-            let mut inodes = self.inodes.lock();
+            let mut inodes = self.inodes.write();
 
             // Check if name already exists
             if inodes.lookup(py, parent, name).is_some() {
@@ -625,11 +713,12 @@ impl Filesystem for MemFs {
             }
 
             // Create the symlink
-            let symlink = PySymlink::new(name.to_string(), target.to_string());
+            let symlink = PySymlink::new(name, target.to_string());
             match Py::new(py, symlink) {
                 Ok(symlink_py) => match inodes.insert_symlink(py, parent, symlink_py) {
                     Ok(ino) => {
                         if let Some(attr) = inodes.getattr(py, ino) {
+                            self.lookups.add(&inodes, ino);
                             reply.entry(&TTL, &to_fuser_attr(&attr), 0);
                         } else {
                             reply.error(ENOENT);
@@ -644,7 +733,7 @@ impl Filesystem for MemFs {
 
     fn readlink(&mut self, _req: &Request, ino: u64, reply: fuser::ReplyData) {
         Python::attach(|py| {
-            let inodes = self.inodes.lock();
+            let inodes = self.inodes.read();
             if let Some(symlink_py) = inodes.get_symlink(ino) {
                 let symlink = symlink_py.borrow(py);
                 reply.data(symlink.target.as_bytes());
@@ -693,15 +782,13 @@ impl Filesystem for MemFs {
     }
 
     fn access(&mut self, _req: &Request, ino: u64, _mask: i32, reply: fuser::ReplyEmpty) {
-        // Simple access check - just verify the inode exists
-        Python::attach(|py| {
-            let inodes = self.inodes.lock();
-            if inodes.getattr(py, ino).is_some() {
-                reply.ok();
-            } else {
-                reply.error(ENOENT);
-            }
-        });
+        // Simple access check - just verify the inode exists. This needs only
+        // the inode table, so skip attaching to Python.
+        if self.inodes.read().get(ino).is_some() {
+            reply.ok();
+        } else {
+            reply.error(ENOENT);
+        }
     }
 
     fn flush(
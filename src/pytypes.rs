@@ -1,9 +1,10 @@
-use crate::fs::MemFs;
-use crate::tree::{InodeTable, NodeRef, PyDirectory, PyFile, PySymlink, ROOT_INO};
+use crate::fs::{KernelTuning, MemFs};
+use crate::tree::{Ino, InodeTable, NodeRef, PyDirectory, PyFile, PySymlink, ROOT_INO};
 use fuser::MountOption;
-use parking_lot::Mutex;
-use pyo3::exceptions::{PyOSError, PyRuntimeError, PyValueError};
+use parking_lot::{Mutex, RwLock};
+use pyo3::exceptions::{PyMemoryError, PyOSError, PyRuntimeError, PyValueError};
 use pyo3::prelude::*;
+use pyo3::types::PyBytes;
 use std::ffi::CString;
 use std::path::PathBuf;
 use std::sync::Arc;
@@ -141,8 +142,52 @@ impl Drop for PyMountHandle {
 /// The main filesystem object
 #[pyclass(name = "MemFS")]
 pub struct PyFilesystem {
-    inodes: Arc<Mutex<InodeTable>>,
+    inodes: Arc<RwLock<InodeTable>>,
     root: Py<PyDirectory>,
+    path_cache: Mutex<PathCache>,
+}
+
+/// Number of recently resolved paths kept by `PathCache`
+const PATH_CACHE_SIZE: usize = 8;
+
+/// Recently resolved paths, so repeated `get`/`exists` calls skip the walk
+///
+/// Entries remember the table generation they were resolved at and only
+/// match while it is unchanged, so any insert, remove or rename (from Python
+/// or through FUSE) invalidates them without touching the cache. Slots are
+/// reused round-robin.
+#[derive(Default)]
+struct PathCache {
+    entries: [Option<(Box<str>, Ino, u64)>; PATH_CACHE_SIZE],
+    next: usize,
+}
+
+impl PathCache {
+    fn get(&self, path: &str, generation: u64) -> Option<Ino> {
+        self.entries
+            .iter()
+            .flatten()
+            .find(|(p, _, g)| *g == generation && &**p == path)
+            .map(|&(_, ino, _)| ino)
+    }
+
+    fn insert(&mut self, path: &str, ino: Ino, generation: u64) {
+        self.entries[self.next] = Some((path.into(), ino, generation));
+        self.next = (self.next + 1) % PATH_CACHE_SIZE;
+    }
+}
+
+impl PyFilesystem {
+    /// `lookup_path` through the path cache
+    fn lookup_cached(&self, inodes: &InodeTable, py: Python<'_>, path: &str) -> Option<Ino> {
+        let generation = inodes.generation();
+        if let Some(ino) = self.path_cache.lock().get(path, generation) {
+            return Some(ino);
+        }
+        let ino = lookup_path(inodes, py, path)?;
+        self.path_cache.lock().insert(path, ino, generation);
+        Some(ino)
+    }
 }
 
 #[pymethods]
@@ -156,8 +201,9 @@ impl PyFilesystem {
         let root = table.init_root(py)?;
 
         Ok(Self {
-            inodes: Arc::new(Mutex::new(table)),
+            inodes: Arc::new(RwLock::new(table)),
             root,
+            path_cache: Mutex::new(PathCache::default()),
         })
     }
 
@@ -173,15 +219,16 @@ impl PyFilesystem {
         &self,
         py: Python<'_>,
         path: &str,
-        content: Option<&[u8]>,
+        content: Option<&Bound<'_, PyBytes>>,
         mode: u16,
     ) -> PyResult<Py<PyFile>> {
-        let (parent_ino, name) = self.resolve_parent(py, path)?;
+        let (parent_path, name) = split_parent(path)?;
 
-        let file = PyFile::new(py, name.to_string(), content, mode)?;
+        let file = PyFile::new(name, content, mode);
         let file_py = Py::new(py, file)?;
 
-        let mut inodes = self.inodes.lock();
+        let mut inodes = self.inodes.write();
+        let parent_ino = resolve_dir(&inodes, py, parent_path)?;
 
         // Check if already exists
         if inodes.lookup(py, parent_ino, name).is_some() {
@@ -196,14 +243,24 @@ impl PyFilesystem {
     }
 
     /// Create a directory in the filesystem
-    #[pyo3(signature = (path, mode=0o755))]
-    fn create_dir(&self, py: Python<'_>, path: &str, mode: u16) -> PyResult<Py<PyDirectory>> {
-        let (parent_ino, name) = self.resolve_parent(py, path)?;
-
-        let dir = PyDirectory::new(name.to_string(), mode);
+    #[pyo3(signature = (path, mode=0o755, *, expected_entries=0))]
+    fn create_dir(
+        &self,
+        py: Python<'_>,
+        path: &str,
+        mode: u16,
+        expected_entries: usize,
+    ) -> PyResult<Py<PyDirectory>> {
+        let (parent_path, name) = split_parent(path)?;
+
+        let mut dir = PyDirectory::new(name, mode);
+        dir.children
+            .reserve(expected_entries)
+            .map_err(|e| PyMemoryError::new_err(e.to_string()))?;
         let dir_py = Py::new(py, dir)?;
 
-        let mut inodes = self.inodes.lock();
+        let mut inodes = self.inodes.write();
+        let parent_ino = resolve_dir(&inodes, py, parent_path)?;
 
         // Check if already exists
         if inodes.lookup(py, parent_ino, name).is_some() {
@@ -220,87 +277,89 @@ impl PyFilesystem {
     /// Create directories recursively (like mkdir -p)
     #[pyo3(signature = (path, mode=0o755))]
     fn makedirs(&self, py: Python<'_>, path: &str, mode: u16) -> PyResult<Py<PyDirectory>> {
-        let parts: Vec<&str> = path
-            .trim_matches('/')
-            .split('/')
-            .filter(|s| !s.is_empty())
-            .collect();
-
-        if parts.is_empty() {
-            return Ok(self.root.clone_ref(py));
-        }
-
+        let mut inodes = self.inodes.write();
         let mut current_ino = ROOT_INO;
-
-        for (i, part) in parts.iter().enumerate() {
-            let mut inodes = self.inodes.lock();
-
-            if let Some(child_ino) = inodes.lookup(py, current_ino, part) {
-                // Directory exists, continue
-                match inodes.get(child_ino) {
-                    Some(NodeRef::Dir(_)) => {
-                        current_ino = child_ino;
-                    }
-                    Some(NodeRef::File(_)) | Some(NodeRef::Symlink(_)) => {
-                        return Err(PyValueError::new_err(format!(
-                            "Path component is a file, not a directory: {}",
-                            part
-                        )));
-                    }
-                    None => {
-                        return Err(PyRuntimeError::new_err("Internal error: dangling inode"));
-                    }
+        let mut parts = components(path).peekable();
+
+        // Walk the part of the path that already exists
+        while let Some(&part) = parts.peek() {
+            let Some(child_ino) = inodes.lookup(py, current_ino, part) else {
+                break;
+            };
+            match inodes.get(child_ino) {
+                Some(NodeRef::Dir(_)) => {
+                    current_ino = child_ino;
                 }
-            } else {
-                // Create the directory
-                let dir = PyDirectory::new(part.to_string(), mode);
-                let dir_py = Py::new(py, dir)?;
-                let new_ino = inodes.insert_dir(py, current_ino, dir_py.clone_ref(py))?;
-                current_ino = new_ino;
-
-                // If this is the last component, return it
-                if i == parts.len() - 1 {
-                    return Ok(dir_py);
+                Some(NodeRef::File(_)) | Some(NodeRef::Symlink(_)) => {
+                    return Err(PyValueError::new_err(format!(
+                        "Path component is a file, not a directory: {}",
+                        part
+                    )));
+                }
+                None => {
+                    return Err(PyRuntimeError::new_err("Internal error: dangling inode"));
                 }
             }
+            parts.next();
         }
 
-        // Return the last directory
-        let inodes = self.inodes.lock();
-        match inodes.get_dir(current_ino) {
-            Some(d) => Ok(d.clone_ref(py)),
-            None => Err(PyRuntimeError::new_err(
-                "Internal error: directory not found",
-            )),
+        if parts.peek().is_none() {
+            return match inodes.get_dir(current_ino) {
+                Some(d) => Ok(d.clone_ref(py)),
+                None => Err(PyRuntimeError::new_err(
+                    "Internal error: directory not found",
+                )),
+            };
         }
+
+        // Create the rest
+        let mut last = None;
+        while let Some(part) = parts.next() {
+            let mut dir = PyDirectory::new(part, mode);
+            if parts.peek().is_some() {
+                // Intermediate directories hold exactly the next component
+                dir.children
+                    .reserve(1)
+                    .map_err(|e| PyMemoryError::new_err(e.to_string()))?;
+            }
+            let dir_py = Py::new(py, dir)?;
+            current_ino = inodes.insert_dir(py, current_ino, dir_py.clone_ref(py))?;
+            last = Some(dir_py);
+        }
+
+        last.ok_or_else(|| PyRuntimeError::new_err("Internal error: directory not found"))
     }
 
     /// Get a file or directory by path
     fn get(&self, py: Python<'_>, path: &str) -> PyResult<Py<PyAny>> {
-        let ino = self.resolve_path(py, path)?;
-        let inodes = self.inodes.lock();
+        let inodes = self.inodes.read();
+        let ino = self
+            .lookup_cached(&inodes, py, path)
+            .ok_or_else(|| path_not_found(path))?;
 
         match inodes.get(ino) {
             Some(NodeRef::File(f)) => Ok(f.clone_ref(py).into_any()),
             Some(NodeRef::Dir(d)) => Ok(d.clone_ref(py).into_any()),
             Some(NodeRef::Symlink(s)) => Ok(s.clone_ref(py).into_any()),
-            None => Err(PyValueError::new_err(format!("Path not found: {}", path))),
+            None => Err(path_not_found(path)),
         }
     }
 
     /// Check if a path exists
     fn exists(&self, py: Python<'_>, path: &str) -> bool {
-        self.resolve_path(py, path).is_ok()
+        let inodes = self.inodes.read();
+        self.lookup_cached(&inodes, py, path).is_some()
     }
 
     /// Create a symbolic link
     fn symlink(&self, py: Python<'_>, target: &str, path: &str) -> PyResult<Py<PySymlink>> {
-        let (parent_ino, name) = self.resolve_parent(py, path)?;
+        let (parent_path, name) = split_parent(path)?;
 
-        let symlink = PySymlink::new(name.to_string(), target.to_string());
+        let symlink = PySymlink::new(name, target.to_string());
         let symlink_py = Py::new(py, symlink)?;
 
-        let mut inodes = self.inodes.lock();
+        let mut inodes = self.inodes.write();
+        let parent_ino = resolve_dir(&inodes, py, parent_path)?;
 
         // Check if already exists
         if inodes.lookup(py, parent_ino, name).is_some() {
@@ -316,8 +375,8 @@ impl PyFilesystem {
 
     /// Read the target of a symbolic link
     fn readlink(&self, py: Python<'_>, path: &str) -> PyResult<String> {
-        let ino = self.resolve_path(py, path)?;
-        let inodes = self.inodes.lock();
+        let inodes = self.inodes.read();
+        let ino = resolve_path(&inodes, py, path)?;
 
         match inodes.get_symlink(ino) {
             Some(s) => Ok(s.borrow(py).target.clone()),
@@ -327,63 +386,72 @@ impl PyFilesystem {
 
     /// Check if path is a symlink
     fn is_symlink(&self, py: Python<'_>, path: &str) -> bool {
-        if let Ok(ino) = self.resolve_path(py, path) {
-            let inodes = self.inodes.lock();
-            matches!(inodes.get(ino), Some(NodeRef::Symlink(_)))
-        } else {
-            false
-        }
+        let inodes = self.inodes.read();
+        lookup_path(&inodes, py, path)
+            .is_some_and(|ino| matches!(inodes.get(ino), Some(NodeRef::Symlink(_))))
     }
 
     /// Remove a file or symlink
     fn remove_file(&self, py: Python<'_>, path: &str) -> PyResult<()> {
-        let ino = self.resolve_path(py, path)?;
-        let mut inodes = self.inodes.lock();
+        let mut inodes = self.inodes.write();
+        let ino = resolve_path(&inodes, py, path)?;
 
         match inodes.get(ino) {
-            Some(NodeRef::File(_)) | Some(NodeRef::Symlink(_)) => {
-                inodes.remove(py, ino)?;
-                Ok(())
-            }
-            Some(NodeRef::Dir(_)) => Err(PyValueError::new_err("Path is a directory")),
-            None => Err(PyValueError::new_err(format!("Path not found: {}", path))),
+            Some(NodeRef::File(_)) | Some(NodeRef::Symlink(_)) => {}
+            Some(NodeRef::Dir(_)) => return Err(PyValueError::new_err("Path is a directory")),
+            None => return Err(path_not_found(path)),
         }
+
+        inodes.remove(py, ino)?;
+        Ok(())
     }
 
     /// Remove a directory (must be empty)
     fn remove_dir(&self, py: Python<'_>, path: &str) -> PyResult<()> {
-        let ino = self.resolve_path(py, path)?;
-        let mut inodes = self.inodes.lock();
+        let mut inodes = self.inodes.write();
+        let ino = resolve_path(&inodes, py, path)?;
 
         match inodes.get(ino) {
             Some(NodeRef::Dir(d)) => {
                 if !d.borrow(py).children.is_empty() {
                     return Err(PyValueError::new_err("Directory not empty"));
                 }
-                inodes.remove(py, ino)?;
-                Ok(())
             }
             Some(NodeRef::File(_)) | Some(NodeRef::Symlink(_)) => {
-                Err(PyValueError::new_err("Path is a file, not a directory"))
+                return Err(PyValueError::new_err("Path is a file, not a directory"));
             }
-            None => Err(PyValueError::new_err(format!("Path not found: {}", path))),
+            None => return Err(path_not_found(path)),
         }
+
+        inodes.remove(py, ino)?;
+        Ok(())
     }
 
     /// List contents of a directory
     fn listdir(&self, py: Python<'_>, path: &str) -> PyResult<Vec<String>> {
-        let ino = self.resolve_path(py, path)?;
-        let inodes = self.inodes.lock();
+        let inodes = self.inodes.read();
+        let ino = resolve_path(&inodes, py, path)?;
 
         match inodes.get_dir(ino) {
-            Some(d) => Ok(d.borrow(py).children.keys().cloned().collect()),
+            Some(d) => Ok(d
+                .borrow(py)
+                .children
+                .iter()
+                .map(|(name, _)| name.to_string())
+                .collect()),
             None => Err(PyValueError::new_err("Path is not a directory")),
         }
     }
 
     /// Mount the filesystem at the given path
-    #[pyo3(signature = (mount_point, allow_other=false))]
-    fn mount(&self, mount_point: &str, allow_other: bool) -> PyResult<PyMountHandle> {
+    #[pyo3(signature = (mount_point, allow_other=false, writeback_cache=false, max_write=None))]
+    fn mount(
+        &self,
+        mount_point: &str,
+        allow_other: bool,
+        writeback_cache: bool,
+        max_write: Option<u32>,
+    ) -> PyResult<PyMountHandle> {
         let mount_path = PathBuf::from(mount_point);
 
         // Ensure mount point exists
@@ -394,7 +462,15 @@ impl PyFilesystem {
             )));
         }
 
-        let fs = MemFs::new(Arc::clone(&self.inodes));
+        if max_write == Some(0) {
+            return Err(PyValueError::new_err("max_write must be positive"));
+        }
+
+        let tuning = KernelTuning {
+            writeback_cache,
+            max_write,
+        };
+        let fs = MemFs::new(Arc::clone(&self.inodes), tuning);
 
         let mut options = vec![
             MountOption::FSName("pyrofs".to_string()),
@@ -416,22 +492,25 @@ impl PyFilesystem {
 
     /// Rename/move a file or directory
     fn rename(&self, py: Python<'_>, old_path: &str, new_path: &str) -> PyResult<()> {
-        let (old_parent_ino, old_name) = self.resolve_parent(py, old_path)?;
-        let (new_parent_ino, new_name) = self.resolve_parent(py, new_path)?;
-
-        let mut inodes = self.inodes.lock();
+        let mut inodes = self.inodes.write();
+        let (old_parent_ino, old_name) = resolve_parent(&inodes, py, old_path)?;
+        let (new_parent_ino, new_name) = resolve_parent(&inodes, py, new_path)?;
 
         // Check source exists
-        if inodes.lookup(py, old_parent_ino, old_name).is_none() {
-            return Err(PyValueError::new_err(format!(
-                "Source path not found: {}",
-                old_path
-            )));
-        }
+        let src_ino = match inodes.lookup(py, old_parent_ino, old_name) {
+            Some(ino) => ino,
+            None => {
+                return Err(PyValueError::new_err(format!(
+                    "Source path not found: {}",
+                    old_path
+                )));
+            }
+        };
 
         // Check if destination exists - if so, handle appropriately
-        if let Some(existing_ino) = inodes.lookup(py, new_parent_ino, new_name) {
-            let src_ino = inodes.lookup(py, old_parent_ino, old_name).unwrap();
+        if let Some(existing_ino) = inodes.lookup(py, new_parent_ino, new_name)
+            && existing_ino != src_ino
+        {
             let src_is_dir = matches!(inodes.get(src_ino), Some(NodeRef::Dir(_)));
             let dst_is_dir = matches!(inodes.get(existing_ino), Some(NodeRef::Dir(_)));
 
@@ -447,12 +526,11 @@ impl PyFilesystem {
             {
                 return Err(PyValueError::new_err("Destination directory not empty"));
             }
-
-            // Remove the destination
-            inodes.remove(py, existing_ino)?;
         }
 
-        inodes.rename(py, old_parent_ino, old_name, new_parent_ino, new_name)
+        // Replaces the destination entry, if any, in the same step
+        inodes.rename(py, old_parent_ino, old_name, new_parent_ino, new_name)?;
+        Ok(())
     }
 
     fn __repr__(&self, py: Python<'_>) -> String {
@@ -461,58 +539,72 @@ impl PyFilesystem {
     }
 }
 
-impl PyFilesystem {
-    /// Resolve a path to its inode
-    fn resolve_path(&self, py: Python<'_>, path: &str) -> PyResult<u64> {
-        let parts: Vec<&str> = path
-            .trim_matches('/')
-            .split('/')
-            .filter(|s| !s.is_empty())
-            .collect();
-
-        if parts.is_empty() {
-            return Ok(ROOT_INO);
-        }
+/// Iterate over the non-empty components of a path
+///
+/// Separators are located with `memchr`, which scans a word or vector
+/// register at a time instead of testing each byte.
+fn components(path: &str) -> impl Iterator<Item = &str> {
+    let mut start = 0;
+    memchr::memchr_iter(b'/', path.as_bytes())
+        .chain(std::iter::once(path.len()))
+        .filter_map(move |end| {
+            let part = &path[start..end];
+            start = end + 1;
+            (!part.is_empty()).then_some(part)
+        })
+}
 
-        let inodes = self.inodes.lock();
-        let mut current = ROOT_INO;
+/// Split a path into its parent path and final component name
+fn split_parent(path: &str) -> PyResult<(&str, &str)> {
+    let path = path.trim_end_matches('/');
+    let (parent, name) = match memchr::memrchr(b'/', path.as_bytes()) {
+        Some(i) => (&path[..i], &path[i + 1..]),
+        None => ("", path),
+    };
 
-        for part in parts {
-            match inodes.lookup(py, current, part) {
-                Some(ino) => current = ino,
-                None => {
-                    return Err(PyValueError::new_err(format!("Path not found: {}", path)));
-                }
-            }
-        }
-
-        Ok(current)
+    if name.is_empty() {
+        return Err(PyValueError::new_err("Cannot operate on root directory"));
     }
 
-    /// Resolve path to parent directory inode and final component name
-    fn resolve_parent<'a>(&self, py: Python<'_>, path: &'a str) -> PyResult<(u64, &'a str)> {
-        let path = path.trim_matches('/');
-        if path.is_empty() {
-            return Err(PyValueError::new_err("Cannot operate on root directory"));
-        }
+    Ok((parent, name))
+}
 
-        let parts: Vec<&str> = path.split('/').filter(|s| !s.is_empty()).collect();
-        let name = parts
-            .last()
-            .ok_or_else(|| PyValueError::new_err("Invalid path"))?;
+/// Resolve a path to its inode in a single walk from the root
+///
+/// Misses are plain `None`, so callers that only test for existence never
+/// build (or format the message for) an exception they would discard.
+fn lookup_path(inodes: &InodeTable, py: Python<'_>, path: &str) -> Option<Ino> {
+    let mut current = ROOT_INO;
+    for part in components(path) {
+        current = inodes.lookup(py, current, part)?;
+    }
+    Some(current)
+}
 
-        if parts.len() == 1 {
-            return Ok((ROOT_INO, name));
-        }
+/// Resolve a path to its inode, raising if it does not exist
+fn resolve_path(inodes: &InodeTable, py: Python<'_>, path: &str) -> PyResult<Ino> {
+    lookup_path(inodes, py, path).ok_or_else(|| path_not_found(path))
+}
 
-        let parent_path = parts[..parts.len() - 1].join("/");
-        let parent_ino = self.resolve_path(py, &parent_path)?;
+fn path_not_found(path: &str) -> PyErr {
+    PyValueError::new_err(format!("Path not found: {}", path))
+}
 
-        // Verify parent is a directory
-        let inodes = self.inodes.lock();
-        match inodes.get(parent_ino) {
-            Some(NodeRef::Dir(_)) => Ok((parent_ino, name)),
-            _ => Err(PyValueError::new_err("Parent is not a directory")),
-        }
+/// Resolve a path that must name a directory
+fn resolve_dir(inodes: &InodeTable, py: Python<'_>, path: &str) -> PyResult<Ino> {
+    let ino = resolve_path(inodes, py, path)?;
+    match inodes.get(ino) {
+        Some(NodeRef::Dir(_)) => Ok(ino),
+        _ => Err(PyValueError::new_err("Parent is not a directory")),
     }
 }
+
+/// Resolve path to parent directory inode and final component name
+fn resolve_parent<'a>(
+    inodes: &InodeTable,
+    py: Python<'_>,
+    path: &'a str,
+) -> PyResult<(Ino, &'a str)> {
+    let (parent_path, name) = split_parent(path)?;
+    Ok((resolve_dir(inodes, py, parent_path)?, name))
+}
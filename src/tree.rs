@@ -1,6 +1,9 @@
 use pyo3::prelude::*;
-use pyo3::types::PyBytes;
-use std::collections::HashMap;
+use pyo3::types::{PyBytes, PyMemoryView, PySlice};
+use rustc_hash::FxHashMap;
+use smol_str::SmolStr;
+use std::collections::TryReserveError;
+use std::sync::atomic::{AtomicU32, AtomicU64, Ordering};
 use std::time::SystemTime;
 
 /// Unique inode identifier
@@ -73,6 +76,47 @@ pub enum FileKind {
     Symlink,
 }
 
+/// The per-node fields a `stat` reads, packed together
+///
+/// Every node embeds one of these so filling a `getattr` reply reads a single
+/// contiguous block (under 64 bytes) instead of fields scattered between
+/// the name, children map and file contents. Size, nlink and ownership are
+/// derived (from the data length, child count and table) rather than stored.
+#[repr(C)]
+#[derive(Clone, Copy, Debug)]
+pub struct HotAttr {
+    pub atime: SystemTime,
+    pub mtime: SystemTime,
+    pub ctime: SystemTime,
+    pub perm: u16,
+}
+
+const _: () = assert!(std::mem::size_of::<HotAttr>() <= 64);
+
+impl HotAttr {
+    pub fn new(perm: u16) -> Self {
+        let now = SystemTime::now();
+        Self {
+            atime: now,
+            mtime: now,
+            ctime: now,
+            perm,
+        }
+    }
+
+    /// Record a content change (mtime and ctime)
+    pub fn touch_modified(&mut self) {
+        let now = SystemTime::now();
+        self.mtime = now;
+        self.ctime = now;
+    }
+
+    /// Record a metadata-only change (ctime)
+    pub fn touch_changed(&mut self) {
+        self.ctime = SystemTime::now();
+    }
+}
+
 /// Reference to a Python-owned node
 pub enum NodeRef {
     File(Py<PyFile>),
@@ -100,126 +144,393 @@ impl NodeRef {
     }
 }
 
+/// File contents, held either as a Python `bytes` object or as a native buffer
+///
+/// Contents stay in a shared `bytes` object until something patches them in
+/// place, so `read()` hands out the same object without copying. The first
+/// in-place write (FUSE `write`, `truncate`) copies them into an owned buffer
+/// that later writes patch directly; the next `read()` converts back once.
+pub enum FileData {
+    Shared(Py<PyBytes>),
+    Owned(Vec<u8>),
+}
+
+impl FileData {
+    /// Contents taken from a caller's `bytes` object
+    ///
+    /// An exact `bytes` is immutable and can be shared as-is; a subclass may
+    /// carry mutable state of its own, so its data is copied into a plain
+    /// `bytes` instead.
+    pub fn from_bytes(data: &Bound<'_, PyBytes>) -> Self {
+        let bytes = if data.is_exact_instance_of::<PyBytes>() {
+            data.clone().unbind()
+        } else {
+            PyBytes::new(data.py(), data.as_bytes()).unbind()
+        };
+        FileData::Shared(bytes)
+    }
+
+    pub fn as_slice<'a>(&'a self, py: Python<'_>) -> &'a [u8] {
+        match self {
+            FileData::Shared(b) => b.as_bytes(py),
+            FileData::Owned(v) => v,
+        }
+    }
+
+    pub fn len(&self, py: Python<'_>) -> usize {
+        self.as_slice(py).len()
+    }
+
+    /// Get the contents as a `bytes` object, converting an owned buffer once
+    pub fn to_bytes(&mut self, py: Python<'_>) -> Py<PyBytes> {
+        let bytes = match self {
+            FileData::Shared(b) => return b.clone_ref(py),
+            FileData::Owned(v) => PyBytes::new(py, v).unbind(),
+        };
+        *self = FileData::Shared(bytes.clone_ref(py));
+        bytes
+    }
+
+    /// Get a mutable buffer, copying shared contents out first
+    pub fn make_mut(&mut self, py: Python<'_>) -> &mut Vec<u8> {
+        if let FileData::Shared(b) = self {
+            let v = b.as_bytes(py).to_vec();
+            *self = FileData::Owned(v);
+        }
+        match self {
+            FileData::Owned(v) => v,
+            FileData::Shared(_) => unreachable!(),
+        }
+    }
+
+    /// Resize in place, zero-filling when growing
+    pub fn resize(&mut self, py: Python<'_>, size: usize) {
+        if let FileData::Shared(b) = self {
+            // Only copy the bytes that survive the truncation
+            let current = b.as_bytes(py);
+            let mut v = current[..size.min(current.len())].to_vec();
+            v.resize(size, 0);
+            *self = FileData::Owned(v);
+        } else {
+            self.make_mut(py).resize(size, 0);
+        }
+    }
+}
+
+/// Source of `PyFile::version` values, shared by every file so a version is
+/// never handed out twice, not even to a new file in a reused inode slot
+static NEXT_VERSION: AtomicU64 = AtomicU64::new(1);
+
+fn next_version() -> u64 {
+    NEXT_VERSION.fetch_add(1, Ordering::Relaxed)
+}
+
 /// A file in the filesystem, backed by Python-owned memory
 #[pyclass(name = "File")]
 pub struct PyFile {
-    #[pyo3(get)]
-    pub name: String,
-    #[pyo3(get, set)]
-    pub content: Py<PyBytes>,
-    #[pyo3(get, set)]
-    pub mode: u16,
+    pub name: SmolStr,
+    pub(crate) attr: HotAttr,
+    pub(crate) data: FileData,
     pub(crate) ino: Ino,
     pub(crate) parent_ino: Ino,
-    pub(crate) mtime: SystemTime,
-    pub(crate) atime: SystemTime,
-    pub(crate) ctime: SystemTime,
+    /// Replaced on every change to the contents, from Python or through any
+    /// mount; FUSE sessions compare it against what their kernel cache holds
+    pub(crate) version: u64,
 }
 
 #[pymethods]
 impl PyFile {
     #[new]
     #[pyo3(signature = (name, content=None, mode=0o644))]
-    pub fn new(py: Python<'_>, name: String, content: Option<&[u8]>, mode: u16) -> PyResult<Self> {
-        let data = content.unwrap_or(b"");
-        let content = PyBytes::new(py, data).into();
-        let now = SystemTime::now();
-        Ok(Self {
-            name,
-            content,
-            mode,
+    pub fn new(name: &str, content: Option<&Bound<'_, PyBytes>>, mode: u16) -> Self {
+        let data = match content {
+            Some(b) => FileData::from_bytes(b),
+            None => FileData::Owned(Vec::new()),
+        };
+        Self {
+            name: SmolStr::new(name),
+            attr: HotAttr::new(mode),
+            data,
             ino: 0, // Assigned when added to filesystem
             parent_ino: 0,
-            mtime: now,
-            atime: now,
-            ctime: now,
-        })
+            version: next_version(),
+        }
+    }
+
+    #[getter]
+    fn name(&self) -> &str {
+        &self.name
+    }
+
+    /// The content of the file
+    #[getter]
+    fn content(&mut self, py: Python<'_>) -> Py<PyBytes> {
+        self.data.to_bytes(py)
+    }
+
+    #[setter]
+    fn set_content(&mut self, value: &Bound<'_, PyBytes>) {
+        self.write(value);
+    }
+
+    /// Permission bits
+    #[getter]
+    fn mode(&self) -> u16 {
+        self.attr.perm
+    }
+
+    #[setter]
+    fn set_mode(&mut self, mode: u16) {
+        self.attr.perm = mode;
     }
 
     /// Get the size of the file in bytes
     #[getter]
     fn size(&self, py: Python<'_>) -> usize {
-        self.content.bind(py).as_bytes().len()
+        self.data.len(py)
     }
 
     /// Read file contents as bytes
-    fn read<'py>(&self, py: Python<'py>) -> Bound<'py, PyBytes> {
-        self.content.bind(py).clone()
+    fn read(&mut self, py: Python<'_>) -> Py<PyBytes> {
+        self.data.to_bytes(py)
+    }
+
+    /// Zero-copy read-only view of the file contents (or a slice of them)
+    ///
+    /// The view is a snapshot: later writes to the file are not reflected.
+    #[pyo3(signature = (start=0, end=None))]
+    fn view<'py>(
+        &mut self,
+        py: Python<'py>,
+        start: usize,
+        end: Option<usize>,
+    ) -> PyResult<Bound<'py, PyAny>> {
+        let bytes = self.data.to_bytes(py).into_bound(py);
+        let len = bytes.as_bytes().len();
+        let end = end.unwrap_or(len).min(len);
+        let start = start.min(end);
+
+        let view = PyMemoryView::from(bytes.as_any())?;
+        if start == 0 && end == len {
+            return Ok(view.into_any());
+        }
+        view.get_item(PySlice::new(py, start as isize, end as isize, 1))
     }
 
     /// Write new contents to the file
-    fn write(&mut self, py: Python<'_>, data: &[u8]) -> PyResult<()> {
-        self.content = PyBytes::new(py, data).into();
-        self.mtime = SystemTime::now();
-        self.ctime = SystemTime::now();
-        Ok(())
+    fn write(&mut self, data: &Bound<'_, PyBytes>) {
+        self.data = FileData::from_bytes(data);
+        self.attr.touch_modified();
+        self.version = next_version();
     }
 
     /// Truncate the file to the given size
-    pub fn truncate(&mut self, py: Python<'_>, size: usize) -> PyResult<()> {
-        let current = self.content.bind(py).as_bytes();
-        let new_data = if size <= current.len() {
-            current[..size].to_vec()
-        } else {
-            let mut v = current.to_vec();
-            v.resize(size, 0);
-            v
-        };
-        self.content = PyBytes::new(py, &new_data).into();
-        self.mtime = SystemTime::now();
-        self.ctime = SystemTime::now();
-        Ok(())
+    pub fn truncate(&mut self, py: Python<'_>, size: usize) {
+        self.data.resize(py, size);
+        self.attr.touch_modified();
+        self.version = next_version();
     }
 
     fn __repr__(&self, py: Python<'_>) -> String {
         format!(
             "File(name={:?}, size={}, mode={:#o})",
             self.name,
-            self.content.bind(py).as_bytes().len(),
-            self.mode
+            self.data.len(py),
+            self.attr.perm
         )
     }
 }
 
+impl PyFile {
+    /// Write `data` at `offset` in place, zero-filling any gap past the end.
+    ///
+    /// Growth goes through `Vec`'s amortized doubling, so a sequential writer
+    /// pays for O(log n) reallocations instead of a full copy per request.
+    pub(crate) fn write_at(&mut self, py: Python<'_>, offset: usize, data: &[u8]) {
+        let buf = self.data.make_mut(py);
+        let end = offset + data.len();
+        if end > buf.len() {
+            buf.resize(end, 0);
+        }
+        buf[offset..end].copy_from_slice(data);
+        self.attr.touch_modified();
+        self.version = next_version();
+    }
+}
+
+/// Directories switch from a sorted vector to a hash map past this size
+const CHILDREN_PROMOTE_AT: usize = 32;
+
+/// Most entries `Children::reserve` makes room for up front; a larger hint
+/// is capped here and the map grows the rest of the way as entries arrive
+const CHILDREN_RESERVE_MAX: usize = 1 << 16;
+
+/// Directory entries, kept in a sorted vector while the directory is small
+///
+/// Most directories hold a handful of entries, where a binary search over
+/// one contiguous allocation beats hashing and costs far less memory than a
+/// map. Past `CHILDREN_PROMOTE_AT` entries the vector is converted to a hash
+/// map once and stays one; removals do not convert back.
+pub enum Children {
+    Small(Vec<(SmolStr, Ino)>),
+    Large(FxHashMap<SmolStr, Ino>),
+}
+
+impl Default for Children {
+    fn default() -> Self {
+        Children::Small(Vec::new())
+    }
+}
+
+impl Children {
+    pub fn get(&self, name: &str) -> Option<Ino> {
+        match self {
+            Children::Small(v) => v
+                .binary_search_by(|(k, _)| k.as_str().cmp(name))
+                .ok()
+                .map(|i| v[i].1),
+            Children::Large(m) => m.get(name).copied(),
+        }
+    }
+
+    /// Insert an entry, returning the inode it replaced, if any
+    pub fn insert(&mut self, name: SmolStr, ino: Ino) -> Option<Ino> {
+        match self {
+            Children::Small(v) => match v.binary_search_by(|(k, _)| k.as_str().cmp(&name)) {
+                Ok(i) => Some(std::mem::replace(&mut v[i].1, ino)),
+                Err(i) if v.len() < CHILDREN_PROMOTE_AT => {
+                    v.insert(i, (name, ino));
+                    None
+                }
+                Err(_) => {
+                    self.promote(1);
+                    self.insert(name, ino)
+                }
+            },
+            Children::Large(m) => m.insert(name, ino),
+        }
+    }
+
+    pub fn remove(&mut self, name: &str) -> Option<Ino> {
+        match self {
+            Children::Small(v) => {
+                let i = v.binary_search_by(|(k, _)| k.as_str().cmp(name)).ok()?;
+                Some(v.remove(i).1)
+            }
+            Children::Large(m) => m.remove(name),
+        }
+    }
+
+    pub fn len(&self) -> usize {
+        match self {
+            Children::Small(v) => v.len(),
+            Children::Large(m) => m.len(),
+        }
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.len() == 0
+    }
+
+    /// Iterate over `(name, inode)` pairs; small directories yield them sorted
+    pub fn iter(&self) -> impl Iterator<Item = (&SmolStr, Ino)> {
+        let (small, large) = match self {
+            Children::Small(v) => (Some(v.iter()), None),
+            Children::Large(m) => (None, Some(m.iter())),
+        };
+        small
+            .into_iter()
+            .flatten()
+            .map(|(k, ino)| (k, *ino))
+            .chain(large.into_iter().flatten().map(|(k, ino)| (k, *ino)))
+    }
+
+    /// Make room for `additional` more entries, up to `CHILDREN_RESERVE_MAX`
+    ///
+    /// `additional` is only a hint, often straight from Python, so failing to
+    /// allocate is reported instead of aborting the process.
+    pub fn reserve(&mut self, additional: usize) -> Result<(), TryReserveError> {
+        let additional = additional.min(CHILDREN_RESERVE_MAX);
+        match self {
+            Children::Small(v) if v.len() + additional <= CHILDREN_PROMOTE_AT => {
+                v.try_reserve(additional)
+            }
+            Children::Small(_) => {
+                self.promote(0);
+                self.reserve(additional)
+            }
+            Children::Large(m) => m.try_reserve(additional),
+        }
+    }
+
+    /// Convert to the hash map form, with room for `additional` more entries
+    fn promote(&mut self, additional: usize) {
+        if let Children::Small(v) = self {
+            let mut m =
+                FxHashMap::with_capacity_and_hasher(v.len() + additional, Default::default());
+            m.extend(v.drain(..));
+            *self = Children::Large(m);
+        }
+    }
+}
+
 /// A directory in the filesystem
 #[pyclass(name = "Directory")]
 pub struct PyDirectory {
-    #[pyo3(get)]
-    pub name: String,
-    #[pyo3(get, set)]
-    pub mode: u16,
+    pub name: SmolStr,
+    pub(crate) attr: HotAttr,
     pub(crate) ino: Ino,
     pub(crate) parent_ino: Ino,
-    pub(crate) children: HashMap<String, Ino>,
-    pub(crate) mtime: SystemTime,
-    pub(crate) atime: SystemTime,
-    pub(crate) ctime: SystemTime,
+    pub(crate) children: Children,
 }
 
 #[pymethods]
 impl PyDirectory {
     #[new]
     #[pyo3(signature = (name, mode=0o755))]
-    pub fn new(name: String, mode: u16) -> Self {
-        let now = SystemTime::now();
+    pub fn new(name: &str, mode: u16) -> Self {
         Self {
-            name,
-            mode,
+            name: SmolStr::new(name),
+            attr: HotAttr::new(mode),
             ino: 0,
             parent_ino: 0,
-            children: HashMap::new(),
-            mtime: now,
-            atime: now,
-            ctime: now,
+            children: Children::default(),
         }
     }
 
+    #[getter]
+    fn name(&self) -> &str {
+        &self.name
+    }
+
+    /// Permission bits
+    #[getter]
+    fn mode(&self) -> u16 {
+        self.attr.perm
+    }
+
+    #[setter]
+    fn set_mode(&mut self, mode: u16) {
+        self.attr.perm = mode;
+    }
+
+    /// Number of direct children, without building a listing
+    fn __len__(&self) -> usize {
+        self.children.len()
+    }
+
+    /// Directories are always truthy, even when empty; without this,
+    /// `__len__` would make an empty directory (such as a fresh root) falsy
+    fn __bool__(&self) -> bool {
+        true
+    }
+
     fn __repr__(&self) -> String {
         format!(
             "Directory(name={:?}, children={}, mode={:#o})",
             self.name,
             self.children.len(),
-            self.mode
+            self.attr.perm
         )
     }
 }
@@ -227,51 +538,108 @@ impl PyDirectory {
 /// A symbolic link in the filesystem
 #[pyclass(name = "Symlink")]
 pub struct PySymlink {
-    #[pyo3(get)]
-    pub name: String,
+    pub name: SmolStr,
     #[pyo3(get, set)]
     pub target: String,
+    pub(crate) attr: HotAttr,
     pub(crate) ino: Ino,
     pub(crate) parent_ino: Ino,
-    pub(crate) mtime: SystemTime,
-    pub(crate) atime: SystemTime,
-    pub(crate) ctime: SystemTime,
 }
 
 #[pymethods]
 impl PySymlink {
     #[new]
-    pub fn new(name: String, target: String) -> Self {
-        let now = SystemTime::now();
+    pub fn new(name: &str, target: String) -> Self {
         Self {
-            name,
+            name: SmolStr::new(name),
             target,
+            attr: HotAttr::new(0o777), // Symlinks are always 777
             ino: 0,
             parent_ino: 0,
-            mtime: now,
-            atime: now,
-            ctime: now,
         }
     }
 
+    #[getter]
+    fn name(&self) -> &str {
+        &self.name
+    }
+
     fn __repr__(&self) -> String {
         format!("Symlink(name={:?}, target={:?})", self.name, self.target)
     }
 }
 
+/// Inode numbers with this bit set live in the leaf arena (files and symlinks)
+///
+/// Bit 31 rather than the top bit, so the first 2^31 directories and leaves
+/// get inode numbers that fit in 32 bits: callers using the non-LFS `stat`
+/// and `getdents` (32-bit builds, compat syscalls) would otherwise see
+/// `EOVERFLOW` on every file.
+const LEAF_INO_BIT: Ino = 1 << 31;
+
+/// Arena indices below this are stored directly in the low bits of an inode
+const INDEX_LOW_MASK: Ino = LEAF_INO_BIT - 1;
+
+/// Inode number for slot `index` of the leaf or directory arena
+///
+/// Index bits from 31 upwards move up one place, past `LEAF_INO_BIT`.
+#[inline]
+fn encode_ino(index: usize, leaf: bool) -> Ino {
+    let index = index as Ino;
+    let tag = if leaf { LEAF_INO_BIT } else { 0 };
+    ((index & !INDEX_LOW_MASK) << 1) | tag | (index & INDEX_LOW_MASK)
+}
+
+/// Arena and slot index for an inode number; the inverse of `encode_ino`
+#[inline]
+fn decode_ino(ino: Ino) -> Option<(bool, usize)> {
+    let index = ((ino >> 32) << 31) | (ino & INDEX_LOW_MASK);
+    Some((ino & LEAF_INO_BIT != 0, usize::try_from(index).ok()?))
+}
+
+/// An inode table arena entry
+#[derive(Default)]
+struct Slot {
+    node: Option<NodeRef>,
+    /// Number of FUSE sessions that may still refer to this inode
+    pins: AtomicU32,
+}
+
 /// The in-memory inode table
+///
+/// Nodes live in dense arenas indexed directly by inode number, so resolving
+/// an inode is a bounds-checked array access instead of a hash probe.
+/// Directories and leaves (files, symlinks) get separate arenas, with leaf
+/// inode numbers tagged by `LEAF_INO_BIT` (see `encode_ino`): path walks and
+/// lookups only ever touch directories, so those stay packed together at the
+/// front instead of being spread across a table dominated by files.
+///
+/// Directory slot 0 is never used (FUSE reserves inode 0). Slots vacated by
+/// removed nodes go on a per-arena free list and are handed out again, so the
+/// arenas stay as large as the peak number of live nodes rather than growing
+/// with every node ever created. A slot whose inode a FUSE session may still
+/// use is only freed once that session forgets it (see `pin`).
 pub struct InodeTable {
-    inodes: HashMap<Ino, NodeRef>,
-    next_ino: Ino,
+    dirs: Vec<Slot>,
+    leaves: Vec<Slot>,
+    free_dirs: Vec<usize>,
+    free_leaves: Vec<usize>,
+    /// Bumped whenever a path may start resolving differently
+    generation: u64,
     pub uid: u32,
     pub gid: u32,
 }
 
 impl InodeTable {
     pub fn new(uid: u32, gid: u32) -> Self {
+        let mut dirs = Vec::with_capacity(64);
+        dirs.push(Slot::default());
         Self {
-            inodes: HashMap::new(),
-            next_ino: ROOT_INO + 1,
+            dirs,
+            leaves: Vec::with_capacity(64),
+            free_dirs: Vec::new(),
+            free_leaves: Vec::new(),
+            generation: 0,
             uid,
             gid,
         }
@@ -279,41 +647,139 @@ impl InodeTable {
 
     /// Initialize with a root directory
     pub fn init_root(&mut self, py: Python<'_>) -> PyResult<Py<PyDirectory>> {
-        let mut root = PyDirectory::new(String::new(), 0o755);
+        let mut root = PyDirectory::new("", 0o755);
         root.ino = ROOT_INO;
         root.parent_ino = ROOT_INO; // Root is its own parent
         let root_py = Py::new(py, root)?;
-        self.inodes
-            .insert(ROOT_INO, NodeRef::Dir(root_py.clone_ref(py)));
+        debug_assert_eq!(self.dirs.len() as Ino, ROOT_INO);
+        self.dirs.push(Slot {
+            node: Some(NodeRef::Dir(root_py.clone_ref(py))),
+            pins: AtomicU32::new(0),
+        });
         Ok(root_py)
     }
 
-    fn alloc_ino(&mut self) -> Ino {
-        let ino = self.next_ino;
-        self.next_ino += 1;
-        ino
+    /// An arena and its free list
+    fn arena_mut(&mut self, leaf: bool) -> (&mut Vec<Slot>, &mut Vec<usize>) {
+        if leaf {
+            (&mut self.leaves, &mut self.free_leaves)
+        } else {
+            (&mut self.dirs, &mut self.free_dirs)
+        }
+    }
+
+    /// Reserve an inode number, reusing a free slot if there is one; the
+    /// caller fills the slot via `store`
+    fn alloc_ino(&mut self, kind: FileKind) -> Ino {
+        let leaf = kind != FileKind::Directory;
+        let (arena, free) = self.arena_mut(leaf);
+        let index = free.pop().unwrap_or_else(|| {
+            arena.push(Slot::default());
+            arena.len() - 1
+        });
+        encode_ino(index, leaf)
+    }
+
+    fn store(&mut self, ino: Ino, node: NodeRef) {
+        let slot = self.slot_mut(ino).expect("inode was allocated");
+        debug_assert!(slot.node.is_none());
+        slot.node = Some(node);
+        self.generation += 1;
+    }
+
+    /// Counter that changes on every insert, remove and rename
+    pub fn generation(&self) -> u64 {
+        self.generation
+    }
+
+    fn slot(&self, ino: Ino) -> Option<&Slot> {
+        match decode_ino(ino)? {
+            (true, index) => self.leaves.get(index),
+            (false, index) => self.dirs.get(index),
+        }
+    }
+
+    fn slot_mut(&mut self, ino: Ino) -> Option<&mut Slot> {
+        match decode_ino(ino)? {
+            (true, index) => self.leaves.get_mut(index),
+            (false, index) => self.dirs.get_mut(index),
+        }
+    }
+
+    /// Take a node out of the table, freeing its slot unless it is pinned
+    fn release(&mut self, ino: Ino) -> Option<NodeRef> {
+        let (leaf, index) = decode_ino(ino)?;
+        let (arena, free) = self.arena_mut(leaf);
+        let slot = arena.get_mut(index)?;
+        let node = slot.node.take()?;
+        if *slot.pins.get_mut() == 0 {
+            free.push(index);
+        }
+        Some(node)
+    }
+
+    /// Keep the slot of `ino` from being reused until a matching `unpin`
+    ///
+    /// FUSE sessions pin every inode they hand to the kernel and unpin it
+    /// once the kernel has forgotten it, so a removed node's inode number is
+    /// never given to a new node while the kernel may still use it. Only
+    /// needs a shared borrow, so lookups can pin under the read lock.
+    pub fn pin(&self, ino: Ino) {
+        if let Some(slot) = self.slot(ino) {
+            slot.pins.fetch_add(1, Ordering::Relaxed);
+        }
+    }
+
+    /// Undo a `pin`
+    ///
+    /// Only needs a shared borrow, so the kernel forgetting inodes (often
+    /// thousands at once) does not hold up readers. Returns true when this
+    /// dropped the last pin of a slot whose node is already gone; the caller
+    /// then frees it with `free_slot` under the write lock.
+    pub fn unpin(&self, ino: Ino) -> bool {
+        let Some(slot) = self.slot(ino) else {
+            return false;
+        };
+        let released = slot
+            .pins
+            .fetch_update(Ordering::Relaxed, Ordering::Relaxed, |n| n.checked_sub(1));
+        released == Ok(1) && slot.node.is_none()
+    }
+
+    /// Put the slot of `ino` on the free list if it is vacant and unpinned
+    pub fn free_slot(&mut self, ino: Ino) {
+        let Some((leaf, index)) = decode_ino(ino) else {
+            return;
+        };
+        let (arena, free) = self.arena_mut(leaf);
+        if let Some(slot) = arena.get_mut(index)
+            && *slot.pins.get_mut() == 0
+            && slot.node.is_none()
+        {
+            free.push(index);
+        }
     }
 
     pub fn get(&self, ino: Ino) -> Option<&NodeRef> {
-        self.inodes.get(&ino)
+        self.slot(ino)?.node.as_ref()
     }
 
     pub fn get_file(&self, ino: Ino) -> Option<&Py<PyFile>> {
-        match self.inodes.get(&ino)? {
+        match self.get(ino)? {
             NodeRef::File(f) => Some(f),
             _ => None,
         }
     }
 
     pub fn get_dir(&self, ino: Ino) -> Option<&Py<PyDirectory>> {
-        match self.inodes.get(&ino)? {
+        match self.get(ino)? {
             NodeRef::Dir(d) => Some(d),
             _ => None,
         }
     }
 
     pub fn get_symlink(&self, ino: Ino) -> Option<&Py<PySymlink>> {
-        match self.inodes.get(&ino)? {
+        match self.get(ino)? {
             NodeRef::Symlink(s) => Some(s),
             _ => None,
         }
@@ -326,7 +792,7 @@ impl InodeTable {
         parent_ino: Ino,
         file: Py<PyFile>,
     ) -> PyResult<Ino> {
-        let ino = self.alloc_ino();
+        let ino = self.alloc_ino(FileKind::File);
 
         // Update file's inode info
         {
@@ -338,14 +804,13 @@ impl InodeTable {
         let name = file.borrow(py).name.clone();
 
         // Add to parent directory
-        if let Some(NodeRef::Dir(parent)) = self.inodes.get(&parent_ino) {
+        if let Some(NodeRef::Dir(parent)) = self.get(parent_ino) {
             let mut p = parent.borrow_mut(py);
             p.children.insert(name, ino);
-            p.mtime = SystemTime::now();
-            p.ctime = SystemTime::now();
+            p.attr.touch_modified();
         }
 
-        self.inodes.insert(ino, NodeRef::File(file));
+        self.store(ino, NodeRef::File(file));
         Ok(ino)
     }
 
@@ -356,7 +821,7 @@ impl InodeTable {
         parent_ino: Ino,
         dir: Py<PyDirectory>,
     ) -> PyResult<Ino> {
-        let ino = self.alloc_ino();
+        let ino = self.alloc_ino(FileKind::Directory);
 
         // Update dir's inode info
         {
@@ -368,14 +833,13 @@ impl InodeTable {
         let name = dir.borrow(py).name.clone();
 
         // Add to parent directory
-        if let Some(NodeRef::Dir(parent)) = self.inodes.get(&parent_ino) {
+        if let Some(NodeRef::Dir(parent)) = self.get(parent_ino) {
             let mut p = parent.borrow_mut(py);
             p.children.insert(name, ino);
-            p.mtime = SystemTime::now();
-            p.ctime = SystemTime::now();
+            p.attr.touch_modified();
         }
 
-        self.inodes.insert(ino, NodeRef::Dir(dir));
+        self.store(ino, NodeRef::Dir(dir));
         Ok(ino)
     }
 
@@ -386,7 +850,7 @@ impl InodeTable {
         parent_ino: Ino,
         symlink: Py<PySymlink>,
     ) -> PyResult<Ino> {
-        let ino = self.alloc_ino();
+        let ino = self.alloc_ino(FileKind::Symlink);
 
         // Update symlink's inode info
         {
@@ -398,20 +862,21 @@ impl InodeTable {
         let name = symlink.borrow(py).name.clone();
 
         // Add to parent directory
-        if let Some(NodeRef::Dir(parent)) = self.inodes.get(&parent_ino) {
+        if let Some(NodeRef::Dir(parent)) = self.get(parent_ino) {
             let mut p = parent.borrow_mut(py);
             p.children.insert(name, ino);
-            p.mtime = SystemTime::now();
-            p.ctime = SystemTime::now();
+            p.attr.touch_modified();
         }
 
-        self.inodes.insert(ino, NodeRef::Symlink(symlink));
+        self.store(ino, NodeRef::Symlink(symlink));
         Ok(ino)
     }
 
     /// Remove a node from the filesystem
     pub fn remove(&mut self, py: Python<'_>, ino: Ino) -> PyResult<Option<NodeRef>> {
-        if let Some(node) = self.inodes.remove(&ino) {
+        if let Some(node) = self.release(ino) {
+            self.generation += 1;
+
             // Get parent and name from the node
             let (parent_ino, name) = match &node {
                 NodeRef::File(f) => {
@@ -429,11 +894,10 @@ impl InodeTable {
             };
 
             // Remove from parent's children
-            if let Some(NodeRef::Dir(parent)) = self.inodes.get(&parent_ino) {
+            if let Some(NodeRef::Dir(parent)) = self.get(parent_ino) {
                 let mut p = parent.borrow_mut(py);
                 p.children.remove(&name);
-                p.mtime = SystemTime::now();
-                p.ctime = SystemTime::now();
+                p.attr.touch_modified();
             }
 
             Ok(Some(node))
@@ -444,29 +908,28 @@ impl InodeTable {
 
     /// Lookup a child by name in a directory
     pub fn lookup(&self, py: Python<'_>, parent_ino: Ino, name: &str) -> Option<Ino> {
-        match self.inodes.get(&parent_ino)? {
-            NodeRef::Dir(d) => d.borrow(py).children.get(name).copied(),
+        match self.get(parent_ino)? {
+            NodeRef::Dir(d) => d.borrow(py).children.get(name),
             _ => None,
         }
     }
 
     /// Get file attributes for an inode
     pub fn getattr(&self, py: Python<'_>, ino: Ino) -> Option<FileAttr> {
-        let node = self.inodes.get(&ino)?;
-        match node {
+        match self.get(ino)? {
             NodeRef::File(f) => {
                 let f = f.borrow(py);
-                let size = f.content.bind(py).as_bytes().len() as u64;
+                let size = f.data.len(py) as u64;
                 Some(FileAttr {
                     ino,
                     size,
                     blocks: size.div_ceil(512),
-                    atime: f.atime,
-                    mtime: f.mtime,
-                    ctime: f.ctime,
-                    crtime: f.ctime,
+                    atime: f.attr.atime,
+                    mtime: f.attr.mtime,
+                    ctime: f.attr.ctime,
+                    crtime: f.attr.ctime,
                     kind: FileKind::File,
-                    perm: f.mode,
+                    perm: f.attr.perm,
                     nlink: 1,
                     uid: self.uid,
                     gid: self.gid,
@@ -478,12 +941,12 @@ impl InodeTable {
                     ino,
                     size: 0,
                     blocks: 0,
-                    atime: d.atime,
-                    mtime: d.mtime,
-                    ctime: d.ctime,
-                    crtime: d.ctime,
+                    atime: d.attr.atime,
+                    mtime: d.attr.mtime,
+                    ctime: d.attr.ctime,
+                    crtime: d.attr.ctime,
                     kind: FileKind::Directory,
-                    perm: d.mode,
+                    perm: d.attr.perm,
                     nlink: 2 + d.children.len() as u32,
                     uid: self.uid,
                     gid: self.gid,
@@ -496,12 +959,12 @@ impl InodeTable {
                     ino,
                     size,
                     blocks: 0,
-                    atime: s.atime,
-                    mtime: s.mtime,
-                    ctime: s.ctime,
-                    crtime: s.ctime,
+                    atime: s.attr.atime,
+                    mtime: s.attr.mtime,
+                    ctime: s.attr.ctime,
+                    crtime: s.attr.ctime,
                     kind: FileKind::Symlink,
-                    perm: 0o777, // Symlinks are always 777
+                    perm: s.attr.perm,
                     nlink: 1,
                     uid: self.uid,
                     gid: self.gid,
@@ -511,6 +974,11 @@ impl InodeTable {
     }
 
     /// Rename/move a node from one location to another
+    ///
+    /// An existing destination entry is replaced in place by the same map
+    /// insert that links the source, so there is never a moment where the
+    /// destination name is missing. The displaced node is dropped from the
+    /// table (see `release`) and returned. Renaming an entry onto itself is a no-op.
     pub fn rename(
         &mut self,
         py: Python<'_>,
@@ -518,39 +986,43 @@ impl InodeTable {
         old_name: &str,
         new_parent: Ino,
         new_name: &str,
-    ) -> PyResult<()> {
+    ) -> PyResult<Option<NodeRef>> {
         // Get the inode being moved
         let ino = self
             .lookup(py, old_parent, old_name)
             .ok_or_else(|| PyErr::new::<pyo3::exceptions::PyValueError, _>("Source not found"))?;
 
+        if self.lookup(py, new_parent, new_name) == Some(ino) {
+            return Ok(None);
+        }
+        self.generation += 1;
+
         // Remove from old parent
-        if let Some(NodeRef::Dir(parent)) = self.inodes.get(&old_parent) {
+        if let Some(NodeRef::Dir(parent)) = self.get(old_parent) {
             let mut p = parent.borrow_mut(py);
             p.children.remove(old_name);
-            p.mtime = SystemTime::now();
-            p.ctime = SystemTime::now();
+            p.attr.touch_modified();
         }
 
         // Update the node's name and parent
-        match self.inodes.get(&ino) {
+        match self.get(ino) {
             Some(NodeRef::File(f)) => {
                 let mut file = f.borrow_mut(py);
-                file.name = new_name.to_string();
+                file.name = SmolStr::new(new_name);
                 file.parent_ino = new_parent;
-                file.ctime = SystemTime::now();
+                file.attr.touch_changed();
             }
             Some(NodeRef::Dir(d)) => {
                 let mut dir = d.borrow_mut(py);
-                dir.name = new_name.to_string();
+                dir.name = SmolStr::new(new_name);
                 dir.parent_ino = new_parent;
-                dir.ctime = SystemTime::now();
+                dir.attr.touch_changed();
             }
             Some(NodeRef::Symlink(s)) => {
                 let mut sym = s.borrow_mut(py);
-                sym.name = new_name.to_string();
+                sym.name = SmolStr::new(new_name);
                 sym.parent_ino = new_parent;
-                sym.ctime = SystemTime::now();
+                sym.attr.touch_changed();
             }
             None => {
                 return Err(PyErr::new::<pyo3::exceptions::PyValueError, _>(
@@ -559,14 +1031,16 @@ impl InodeTable {
             }
         }
 
-        // Add to new parent
-        if let Some(NodeRef::Dir(parent)) = self.inodes.get(&new_parent) {
-            let mut p = parent.borrow_mut(py);
-            p.children.insert(new_name.to_string(), ino);
-            p.mtime = SystemTime::now();
-            p.ctime = SystemTime::now();
-        }
+        // Add to new parent, replacing any existing entry
+        let displaced = match self.get(new_parent) {
+            Some(NodeRef::Dir(parent)) => {
+                let mut p = parent.borrow_mut(py);
+                p.attr.touch_modified();
+                p.children.insert(SmolStr::new(new_name), ino)
+            }
+            _ => None,
+        };
 
-        Ok(())
+        Ok(displaced.and_then(|old| self.release(old)))
     }
 }
@@ -0,0 +1,116 @@
+"""Shared pytest configuration for pyrofs tests."""
+
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+
+import pytest
+
+_HAS_FUSE = os.path.exists("/dev/fuse")
+
+
+def pytest_configure(config):
+    """Register the markers used by the test suite."""
+    config.addinivalue_line(
+        "markers",
+        "fuse: marks tests that require FUSE filesystem support (deselect with '-m \"not fuse\"')",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip every test marked `fuse` when FUSE is unavailable."""
+    if _HAS_FUSE:
+        return
+    skip = pytest.mark.skip(reason="FUSE not available")
+    for item in items:
+        if "fuse" in item.keywords:
+            item.add_marker(skip)
+
+
+def _fuse_mount_points(mountinfo):
+    """Yield the mount points of FUSE filesystems listed in an open mountinfo."""
+    mountinfo.seek(0)
+    for line in mountinfo:
+        fields = line.split()
+        fstype = fields[fields.index("-") + 1]
+        if fstype.startswith("fuse"):
+            yield fields[4]
+
+
+def _is_fuse_mounted(path):
+    """Whether a FUSE filesystem is currently attached at `path`."""
+    with open("/proc/self/mountinfo") as mountinfo:
+        return os.path.realpath(path) in _fuse_mount_points(mountinfo)
+
+
+def _wait_mounted(path, timeout=2.0):
+    """Poll until a FUSE filesystem is attached at `path`.
+
+    Checks /proc/self/mountinfo rather than the mount point itself, so the
+    poll never issues a request to a session that is still starting up.
+    """
+    path = os.path.realpath(path)
+    deadline = time.monotonic() + timeout
+    with open("/proc/self/mountinfo") as mountinfo:
+        while path not in _fuse_mount_points(mountinfo):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{path} was not mounted within {timeout}s")
+            time.sleep(0.001)
+
+
+@contextmanager
+def _mounted_fs(fs, path, **options):
+    """Mount `fs` at `path` and wait until the kernel has attached it."""
+    with fs.mount(path, allow_other=False, **options) as handle:
+        _wait_mounted(path)
+        yield handle
+
+
+@pytest.fixture(scope="session")
+def fuse_available():
+    """Skip the requesting test when /dev/fuse is missing."""
+    if not _HAS_FUSE:
+        pytest.skip("FUSE not available")
+
+
+def _unmount_leftover(path):
+    """Make sure nothing is left mounted on `path`.
+
+    The mount handle normally unmounts on exit and pytest removes the
+    directory itself; this only cleans up after a test that failed midway.
+    """
+    delay = 0.01
+    for _ in range(8):
+        if not _is_fuse_mounted(path):
+            return
+        subprocess.run(["fusermount", "-u", path], capture_output=True)
+        time.sleep(delay)
+        delay *= 2
+    # Force a lazy unmount if still busy
+    subprocess.run(["fusermount", "-uz", path], capture_output=True)
+
+
+@pytest.fixture
+def mount_dir(fuse_available, tmp_path_factory):
+    """Create a temporary directory for mounting."""
+    path = str(tmp_path_factory.mktemp("pyrofs-mnt"))
+    yield path
+    _unmount_leftover(path)
+
+
+@pytest.fixture
+def second_mount_dir(fuse_available, tmp_path_factory):
+    """Another mount point, for tests that mount one filesystem twice."""
+    path = str(tmp_path_factory.mktemp("pyrofs-mnt"))
+    yield path
+    _unmount_leftover(path)
+
+
+@pytest.fixture
+def mounted_fs():
+    """Context manager that mounts a filesystem and waits until it is attached.
+
+    Usage: ``with mounted_fs(fs, mount_dir, **mount_options) as handle: ...``
+    """
+    return _mounted_fs
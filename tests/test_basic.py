@@ -1,10 +1,55 @@
 """Tests for pyrofs."""
 
 import os
-import tempfile
-import time
+import re
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 
+from pyrofs import Directory, File, MemFS, Symlink
+
+# Test payloads, built once per process
+_CONTENT = b"content"
+_HELLO = b"Hello, World!"
+_LARGE_1MB = b"x" * (1024 * 1024)
+_MANY = [(f"/file{i}.txt", f"content{i}".encode()) for i in range(1000)]
+_DEEP_PATH = "/" + "/".join(f"level{i}" for i in range(50))
+
+_WORKERS = os.cpu_count() or 4
+
+# Error message patterns, compiled once
+_NOT_EMPTY = re.compile("not empty")
+_EXISTS = re.compile("already exists")
+_DIRECTORY = re.compile("directory")
+
+
+def _assert_state(fs, present=(), absent=()):
+    """Assert that every path in `present` exists and none in `absent` do."""
+    missing = [p for p in present if not fs.exists(p)]
+    unexpected = [p for p in absent if fs.exists(p)]
+    assert not missing, f"expected to exist: {missing}"
+    assert not unexpected, f"expected not to exist: {unexpected}"
+
+
+@pytest.fixture(scope="session")
+def ro_fs():
+    """A pre-populated filesystem shared by tests that only read from it."""
+    fs = MemFS()
+    fs.create_file("/test.txt", b"Content")
+    fs.create_file("/exists.txt", b"I exist")
+    fs.create_dir("/mydir")
+    fs.create_dir("/listing")
+    fs.create_file("/listing/a.txt", b"a")
+    fs.create_file("/listing/b.txt", b"b")
+    fs.create_dir("/listing/subdir")
+    return fs
+
+
+@pytest.fixture(scope="session")
+def thread_pool():
+    """A worker pool reused by the concurrency tests."""
+    with ThreadPoolExecutor(max_workers=_WORKERS) as pool:
+        yield pool
+
 
 def test_import():
     """Test that the module can be imported."""
@@ -17,50 +62,58 @@ def test_import():
 
 def test_create_filesystem():
     """Test creating an empty filesystem."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     assert fs.root is not None
 
 
-def test_create_file():
-    """Test creating a file."""
-    from pyrofs import MemFS
-
+@pytest.mark.parametrize(
+    "name, content, expected",
+    [
+        ("test.txt", _HELLO, _HELLO),
+        ("empty.txt", None, b""),
+    ],
+    ids=["with_content", "empty"],
+)
+def test_create_file(name, content, expected):
+    """Test creating a file, with and without initial content."""
     fs = MemFS()
-    f = fs.create_file("/test.txt", b"Hello, World!")
+    f = fs.create_file(f"/{name}", content)
 
-    assert f.name == "test.txt"
-    assert f.size == 13
-    assert f.read() == b"Hello, World!"
+    assert f.name == name
+    assert f.size == len(expected)
+    assert f.read() == expected
 
 
-def test_create_file_empty():
-    """Test creating an empty file."""
-    from pyrofs import MemFS
-
+def test_create_directory():
+    """Test creating a directory."""
     fs = MemFS()
-    f = fs.create_file("/empty.txt")
+    d = fs.create_dir("/subdir")
 
-    assert f.name == "empty.txt"
-    assert f.size == 0
-    assert f.read() == b""
+    assert d.name == "subdir"
 
 
-def test_create_directory():
-    """Test creating a directory."""
-    from pyrofs import MemFS
+def test_create_directory_expected_entries():
+    """Test pre-sizing a directory for the entries it will hold."""
+    fs = MemFS()
+    fs.create_dir("/big", expected_entries=100)
+    for i in range(100):
+        fs.create_file(f"/big/f{i}.txt")
+
+    assert len(fs.listdir("/big")) == 100
+
 
+@pytest.mark.parametrize("hint", [10**12, 2**63], ids=["huge", "overflow"])
+def test_create_directory_oversized_hint(hint):
+    """Test that an oversized entry hint is capped rather than allocated."""
     fs = MemFS()
-    d = fs.create_dir("/subdir")
+    fs.create_dir("/big", expected_entries=hint)
+    fs.create_file("/big/a.txt")
 
-    assert d.name == "subdir"
+    assert fs.listdir("/big") == ["a.txt"]
 
 
 def test_create_nested_file():
     """Test creating a file in a subdirectory."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_dir("/subdir")
     f = fs.create_file("/subdir/nested.txt", b"Nested content")
@@ -71,105 +124,81 @@ def test_create_nested_file():
 
 def test_makedirs():
     """Test recursive directory creation."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     d = fs.makedirs("/a/b/c/d")
 
     assert d.name == "d"
-    assert fs.exists("/a")
-    assert fs.exists("/a/b")
-    assert fs.exists("/a/b/c")
-    assert fs.exists("/a/b/c/d")
+    _assert_state(fs, present=["/a", "/a/b", "/a/b/c", "/a/b/c/d"])
 
 
-def test_get_file():
+def test_get_file(ro_fs):
     """Test getting a file by path."""
-    from pyrofs import MemFS, File
-
-    fs = MemFS()
-    fs.create_file("/test.txt", b"Content")
-
-    f = fs.get("/test.txt")
+    f = ro_fs.get("/test.txt")
     assert isinstance(f, File)
     assert f.read() == b"Content"
 
 
-def test_get_directory():
+def test_get_directory(ro_fs):
     """Test getting a directory by path."""
-    from pyrofs import MemFS, Directory
-
-    fs = MemFS()
-    fs.create_dir("/mydir")
-
-    d = fs.get("/mydir")
+    d = ro_fs.get("/mydir")
     assert isinstance(d, Directory)
 
 
-def test_exists():
+def test_exists(ro_fs):
     """Test path existence check."""
-    from pyrofs import MemFS
-
-    fs = MemFS()
-    fs.create_file("/exists.txt", b"I exist")
+    _assert_state(ro_fs, present=["/exists.txt"], absent=["/does_not_exist.txt"])
 
-    assert fs.exists("/exists.txt")
-    assert not fs.exists("/does_not_exist.txt")
-
-
-def test_listdir():
-    """Test directory listing."""
-    from pyrofs import MemFS
 
+def test_exists_tracks_changes():
+    """Test that repeated lookups see renames and removals."""
     fs = MemFS()
     fs.create_file("/a.txt", b"a")
-    fs.create_file("/b.txt", b"b")
-    fs.create_dir("/subdir")
-
-    contents = fs.listdir("/")
-    assert set(contents) == {"a.txt", "b.txt", "subdir"}
+    assert fs.exists("/a.txt")
 
+    fs.rename("/a.txt", "/b.txt")
+    _assert_state(fs, present=["/b.txt"], absent=["/a.txt"])
+    assert fs.get("/b.txt").read() == b"a"
 
-def test_remove_file():
-    """Test file removal."""
-    from pyrofs import MemFS
+    fs.remove_file("/b.txt")
+    assert not fs.exists("/b.txt")
 
-    fs = MemFS()
-    fs.create_file("/temp.txt", b"temporary")
+    fs.create_file("/a.txt", b"again")
+    assert fs.get("/a.txt").read() == b"again"
 
-    assert fs.exists("/temp.txt")
-    fs.remove_file("/temp.txt")
-    assert not fs.exists("/temp.txt")
 
+def test_listdir(ro_fs):
+    """Test directory listing."""
+    contents = ro_fs.listdir("/listing")
+    assert set(contents) == {"a.txt", "b.txt", "subdir"}
 
-def test_remove_dir():
-    """Test directory removal."""
-    from pyrofs import MemFS
 
+@pytest.mark.parametrize(
+    "create, remove",
+    [("create_file", "remove_file"), ("create_dir", "remove_dir")],
+    ids=["file", "dir"],
+)
+def test_remove(create, remove):
+    """Test removing a file or an empty directory."""
     fs = MemFS()
-    fs.create_dir("/emptydir")
+    getattr(fs, create)("/temp")
 
-    assert fs.exists("/emptydir")
-    fs.remove_dir("/emptydir")
-    assert not fs.exists("/emptydir")
+    assert fs.exists("/temp")
+    getattr(fs, remove)("/temp")
+    assert not fs.exists("/temp")
 
 
 def test_remove_dir_not_empty():
     """Test that removing non-empty directory fails."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_dir("/notempty")
-    fs.create_file("/notempty/file.txt", b"content")
+    fs.create_file("/notempty/file.txt", _CONTENT)
 
-    with pytest.raises(ValueError, match="not empty"):
+    with pytest.raises(ValueError, match=_NOT_EMPTY):
         fs.remove_dir("/notempty")
 
 
 def test_file_write():
     """Test writing to a file."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     f = fs.create_file("/writable.txt", b"initial")
 
@@ -178,113 +207,101 @@ def test_file_write():
     assert f.size == 15
 
 
-def test_file_truncate():
-    """Test truncating a file."""
-    from pyrofs import MemFS
-
-    fs = MemFS()
-    f = fs.create_file("/truncate.txt", b"Hello, World!")
-
-    f.truncate(5)
-    assert f.read() == b"Hello"
-    assert f.size == 5
-
+def test_file_bytes_subclass_stored_as_bytes():
+    """Test that bytes subclasses are stored and returned as plain bytes."""
 
-def test_file_truncate_extend():
-    """Test truncating a file to a larger size."""
-    from pyrofs import MemFS
+    class Tagged(bytes):
+        pass
 
     fs = MemFS()
-    f = fs.create_file("/extend.txt", b"Hi")
-
-    f.truncate(10)
-    assert f.size == 10
-    assert f.read() == b"Hi\x00\x00\x00\x00\x00\x00\x00\x00"
+    f = fs.create_file("/tagged.txt", Tagged(b"created"))
+    assert type(f.read()) is bytes
 
+    f.write(Tagged(b"written"))
+    assert type(f.read()) is bytes
+    assert f.read() == b"written"
 
-def test_file_mode():
-    """Test file permissions."""
-    from pyrofs import MemFS
 
+def test_file_view():
+    """Test zero-copy views of file contents."""
     fs = MemFS()
-    f = fs.create_file("/perms.txt", b"", mode=0o600)
+    f = fs.create_file("/view.txt", _HELLO)
 
-    assert f.mode == 0o600
+    view = f.view()
+    assert isinstance(view, memoryview)
+    assert view.readonly
+    assert view == _HELLO
+    assert f.view(7) == b"World!"
+    assert f.view(0, 5) == b"Hello"
+    assert f.view(5, 100) == b", World!"
 
+    # Views are snapshots
+    f.write(b"changed")
+    assert view == _HELLO
+    assert f.view() == b"changed"
 
-def test_directory_mode():
-    """Test directory permissions."""
-    from pyrofs import MemFS
 
+@pytest.mark.parametrize(
+    "initial, size, expected",
+    [
+        (_HELLO, 5, b"Hello"),
+        (b"Hi", 10, b"Hi" + b"\x00" * 8),
+    ],
+    ids=["shrink", "extend"],
+)
+def test_file_truncate(initial, size, expected):
+    """Test truncating a file to a smaller or larger size."""
     fs = MemFS()
-    d = fs.create_dir("/private", mode=0o700)
-
-    assert d.mode == 0o700
+    f = fs.create_file("/truncate.txt", initial)
 
+    f.truncate(size)
+    assert f.size == size
+    assert f.read() == expected
 
-def test_duplicate_file():
-    """Test that creating duplicate file fails."""
-    from pyrofs import MemFS
 
+@pytest.mark.parametrize(
+    "create, mode",
+    [("create_file", 0o600), ("create_dir", 0o700)],
+    ids=["file", "dir"],
+)
+def test_mode(create, mode):
+    """Test file and directory permissions."""
     fs = MemFS()
-    fs.create_file("/dup.txt", b"first")
+    node = getattr(fs, create)("/private", mode=mode)
 
-    with pytest.raises(ValueError, match="already exists"):
-        fs.create_file("/dup.txt", b"second")
+    assert node.mode == mode
 
 
-def test_duplicate_dir():
-    """Test that creating duplicate directory fails."""
-    from pyrofs import MemFS
-
+@pytest.mark.parametrize("create", ["create_file", "create_dir"], ids=["file", "dir"])
+def test_duplicate(create):
+    """Test that creating a duplicate file or directory fails."""
     fs = MemFS()
-    fs.create_dir("/dupdir")
+    getattr(fs, create)("/dup")
 
-    with pytest.raises(ValueError, match="already exists"):
-        fs.create_dir("/dupdir")
+    with pytest.raises(ValueError, match=_EXISTS):
+        getattr(fs, create)("/dup")
 
 
 # FUSE mount tests - these require FUSE to be available
-@pytest.fixture
-def mount_dir():
-    """Create a temporary directory for mounting."""
-    tmpdir = tempfile.mkdtemp()
-    yield tmpdir
-    # Give FUSE time to fully unmount before cleanup
-    for _ in range(10):
-        try:
-            os.rmdir(tmpdir)
-            break
-        except OSError:
-            time.sleep(0.2)
-    else:
-        # Force unmount if still busy
-        import subprocess
-
-        subprocess.run(["fusermount", "-uz", tmpdir], capture_output=True)
-        time.sleep(0.1)
-        try:
-            os.rmdir(tmpdir)
-        except OSError:
-            pass  # Best effort cleanup
+def _write_raw(path, data):
+    """Write `data` to `path` with a single unbuffered write(2)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_mount_unmount(mount_dir):
+def test_mount_unmount(mount_dir, mounted_fs):
     """Test mounting and unmounting the filesystem."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_file("/test.txt", b"Test content")
 
-    with fs.mount(mount_dir, allow_other=False) as handle:
+    with mounted_fs(fs, mount_dir) as handle:
         assert handle.is_mounted
         assert handle.mount_point == mount_dir
 
-        # Give FUSE a moment to set up
-        time.sleep(0.1)
-
         # Check that the file is visible
         mount_path = os.path.join(mount_dir, "test.txt")
         assert os.path.exists(mount_path)
@@ -297,39 +314,44 @@ def test_mount_unmount(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_write_through_fuse(mount_dir):
+def test_write_through_fuse(mount_dir, mounted_fs):
     """Test writing through the FUSE mount."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     f = fs.create_file("/writable.txt", b"initial")
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         mount_path = os.path.join(mount_dir, "writable.txt")
 
         # Write through FUSE
-        with open(mount_path, "wb") as fh:
-            fh.write(b"written through fuse")
+        _write_raw(mount_path, b"written through fuse")
 
         # Verify Python side sees the change
         assert f.read() == b"written through fuse"
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_python_write_visible_in_fuse(mount_dir):
-    """Test that Python writes are visible through FUSE."""
-    from pyrofs import MemFS
+def test_write_through_fuse_writeback_cache(mount_dir, mounted_fs):
+    """Test that writes buffered by the kernel reach Python on close."""
+    fs = MemFS()
+    f = fs.create_file("/buffered.txt", b"")
+
+    with mounted_fs(fs, mount_dir, writeback_cache=True, max_write=1 << 20):
+        mount_path = os.path.join(mount_dir, "buffered.txt")
 
+        with open(mount_path, "wb") as fh:
+            for _ in range(64):
+                fh.write(b"x" * 1024)
+
+        assert f.read() == b"x" * (64 * 1024)
+
+
+@pytest.mark.fuse
+def test_python_write_visible_in_fuse(mount_dir, mounted_fs):
+    """Test that Python writes are visible through FUSE."""
     fs = MemFS()
     f = fs.create_file("/sync.txt", b"original")
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         mount_path = os.path.join(mount_dir, "sync.txt")
 
         # Modify from Python side
@@ -341,21 +363,61 @@ def test_python_write_visible_in_fuse(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_create_file_through_fuse(mount_dir):
-    """Test creating a file through the FUSE mount."""
-    from pyrofs import MemFS
+def test_python_write_after_fuse_read_visible(mount_dir, mounted_fs):
+    """Test that Python writes invalidate pages cached by earlier FUSE reads."""
+    fs = MemFS()
+    f = fs.create_file("/cached.txt", b"first version")
+
+    with mounted_fs(fs, mount_dir):
+        mount_path = os.path.join(mount_dir, "cached.txt")
 
+        # Open twice so the second open may keep the kernel's cache
+        for _ in range(2):
+            with open(mount_path, "rb") as fh:
+                assert fh.read() == b"first version"
+
+        # Same length, so a size change can't mask a stale cache
+        f.write(b"other version")
+
+        with open(mount_path, "rb") as fh:
+            assert fh.read() == b"other version"
+
+
+@pytest.mark.fuse
+def test_fuse_write_visible_in_other_mount(mount_dir, second_mount_dir, mounted_fs):
+    """Test that writes through one mount invalidate another mount's cache."""
     fs = MemFS()
+    fs.create_file("/cached.txt", b"first version")
+    path_a = os.path.join(mount_dir, "cached.txt")
+    path_b = os.path.join(second_mount_dir, "cached.txt")
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
+    with mounted_fs(fs, mount_dir), mounted_fs(fs, second_mount_dir):
+        # Open through both mounts so either may keep its cache next time
+        for path in (path_a, path_b, path_b):
+            with open(path, "rb") as fh:
+                assert fh.read() == b"first version"
 
+        # Overwrite in place through A, same length and without truncating
+        fd = os.open(path_a, os.O_WRONLY)
+        try:
+            os.pwrite(fd, b"other version", 0)
+        finally:
+            os.close(fd)
+
+        with open(path_b, "rb") as fh:
+            assert fh.read() == b"other version"
+
+
+@pytest.mark.fuse
+def test_create_file_through_fuse(mount_dir, mounted_fs):
+    """Test creating a file through the FUSE mount."""
+    fs = MemFS()
+
+    with mounted_fs(fs, mount_dir):
         mount_path = os.path.join(mount_dir, "newfile.txt")
 
         # Create through FUSE
-        with open(mount_path, "wb") as fh:
-            fh.write(b"created through fuse")
+        _write_raw(mount_path, b"created through fuse")
 
         # Verify Python side sees it
         assert fs.exists("/newfile.txt")
@@ -364,16 +426,11 @@ def test_create_file_through_fuse(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_mkdir_through_fuse(mount_dir):
+def test_mkdir_through_fuse(mount_dir, mounted_fs):
     """Test creating a directory through the FUSE mount."""
-    from pyrofs import MemFS
-
     fs = MemFS()
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         new_dir = os.path.join(mount_dir, "newdir")
         os.mkdir(new_dir)
 
@@ -382,98 +439,78 @@ def test_mkdir_through_fuse(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_listdir_through_fuse(mount_dir):
+def test_listdir_through_fuse(mount_dir, mounted_fs):
     """Test listing directory through FUSE."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_file("/a.txt", b"a")
     fs.create_file("/b.txt", b"b")
     fs.create_dir("/subdir")
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         contents = os.listdir(mount_dir)
         assert set(contents) == {"a.txt", "b.txt", "subdir"}
 
 
-def test_rename_file():
-    """Test renaming a file via Python API."""
-    from pyrofs import MemFS
-
+@pytest.mark.parametrize(
+    "dirs, files, src, dst",
+    [
+        ([], {"/old.txt": _CONTENT}, "/old.txt", "/new.txt"),
+        (["/subdir"], {"/file.txt": _CONTENT}, "/file.txt", "/subdir/file.txt"),
+        (
+            [],
+            {"/src.txt": b"new content", "/dst.txt": b"old content"},
+            "/src.txt",
+            "/dst.txt",
+        ),
+    ],
+    ids=["rename", "to_subdir", "overwrite"],
+)
+def test_rename_file(dirs, files, src, dst):
+    """Test renaming, moving and overwriting files via Python API."""
     fs = MemFS()
-    fs.create_file("/old.txt", b"content")
-
-    fs.rename("/old.txt", "/new.txt")
+    for path in dirs:
+        fs.create_dir(path)
+    for path, content in files.items():
+        fs.create_file(path, content)
 
-    assert not fs.exists("/old.txt")
-    assert fs.exists("/new.txt")
-    assert fs.get("/new.txt").read() == b"content"
+    fs.rename(src, dst)
 
-
-def test_rename_file_to_subdir():
-    """Test moving a file to a subdirectory."""
-    from pyrofs import MemFS
-
-    fs = MemFS()
-    fs.create_file("/file.txt", b"content")
-    fs.create_dir("/subdir")
-
-    fs.rename("/file.txt", "/subdir/file.txt")
-
-    assert not fs.exists("/file.txt")
-    assert fs.exists("/subdir/file.txt")
-    assert fs.get("/subdir/file.txt").read() == b"content"
+    _assert_state(fs, present=[dst], absent=[src])
+    assert fs.get(dst).read() == files[src]
 
 
 def test_rename_directory():
     """Test renaming a directory."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_dir("/olddir")
-    fs.create_file("/olddir/file.txt", b"content")
+    fs.create_file("/olddir/file.txt", _CONTENT)
 
     fs.rename("/olddir", "/newdir")
 
-    assert not fs.exists("/olddir")
-    assert fs.exists("/newdir")
-    assert fs.exists("/newdir/file.txt")
-
+    _assert_state(fs, present=["/newdir", "/newdir/file.txt"], absent=["/olddir"])
 
-def test_rename_overwrite_file():
-    """Test renaming over an existing file."""
-    from pyrofs import MemFS
 
+def test_rename_onto_itself():
+    """Test renaming a file onto its own path leaves it in place."""
     fs = MemFS()
-    fs.create_file("/src.txt", b"new content")
-    fs.create_file("/dst.txt", b"old content")
+    fs.create_file("/same.txt", _CONTENT)
 
-    fs.rename("/src.txt", "/dst.txt")
+    fs.rename("/same.txt", "/same.txt")
 
-    assert not fs.exists("/src.txt")
-    assert fs.get("/dst.txt").read() == b"new content"
+    assert fs.get("/same.txt").read() == _CONTENT
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_rename_through_fuse(mount_dir):
+def test_rename_through_fuse(mount_dir, mounted_fs):
     """Test renaming through FUSE mount (atomic write pattern)."""
-    from pyrofs import MemFS
-
     fs = MemFS()
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         # Write to temp file, then rename (atomic write pattern)
         tmp_path = os.path.join(mount_dir, "file.tmp")
         final_path = os.path.join(mount_dir, "file.txt")
 
-        with open(tmp_path, "wb") as f:
-            f.write(b"atomic content")
+        _write_raw(tmp_path, b"atomic content")
 
         os.rename(tmp_path, final_path)
 
@@ -484,17 +521,34 @@ def test_rename_through_fuse(mount_dir):
             assert f.read() == b"atomic content"
 
         # Verify Python side sees it
-        assert not fs.exists("/file.tmp")
-        assert fs.exists("/file.txt")
+        _assert_state(fs, present=["/file.txt"], absent=["/file.tmp"])
         assert fs.get("/file.txt").read() == b"atomic content"
 
 
+@pytest.mark.fuse
+def test_inode_slots_reused(mount_dir, mounted_fs):
+    """Test that replaced files give their inode slots back."""
+    fs = MemFS()
+    fs.create_file("/keep.txt", b"keep")
+    for _ in range(100):
+        fs.create_file("/file.tmp", _CONTENT)
+        fs.rename("/file.tmp", "/file.txt")
+
+    with mounted_fs(fs, mount_dir):
+        inos = [os.stat(os.path.join(mount_dir, n)).st_ino for n in ("keep.txt", "file.txt")]
+        with open(os.path.join(mount_dir, "file.txt"), "rb") as f:
+            assert f.read() == _CONTENT
+
+    # Leaf inodes are numbered up from 2**31; without reuse the last
+    # file.txt would sit in slot 100
+    assert len(set(inos)) == 2
+    assert all(2**31 <= ino < 2**31 + 3 for ino in inos)
+
+
 def test_symlink_python_api():
     """Test creating and reading symlinks via Python API."""
-    from pyrofs import MemFS, Symlink
-
     fs = MemFS()
-    fs.create_file("/target.txt", b"content")
+    fs.create_file("/target.txt", _CONTENT)
 
     link = fs.symlink("/target.txt", "/link.txt")
 
@@ -508,10 +562,8 @@ def test_symlink_python_api():
 
 def test_symlink_in_listdir():
     """Test that symlinks appear in directory listings."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    fs.create_file("/file.txt", b"content")
+    fs.create_file("/file.txt", _CONTENT)
     fs.symlink("/file.txt", "/link.txt")
 
     contents = fs.listdir("/")
@@ -520,30 +572,23 @@ def test_symlink_in_listdir():
 
 def test_remove_symlink():
     """Test removing a symlink."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    fs.create_file("/target.txt", b"content")
+    fs.create_file("/target.txt", _CONTENT)
     fs.symlink("/target.txt", "/link.txt")
 
     fs.remove_file("/link.txt")
 
-    assert not fs.exists("/link.txt")
-    assert fs.exists("/target.txt")  # Target should still exist
+    # Target should still exist
+    _assert_state(fs, present=["/target.txt"], absent=["/link.txt"])
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_symlink_through_fuse(mount_dir):
+def test_symlink_through_fuse(mount_dir, mounted_fs):
     """Test creating and reading symlinks through FUSE."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_file("/target.txt", b"symlink target content")
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         target_path = os.path.join(mount_dir, "target.txt")
         link_path = os.path.join(mount_dir, "link.txt")
 
@@ -560,18 +605,13 @@ def test_symlink_through_fuse(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_symlink_python_visible_in_fuse(mount_dir):
+def test_symlink_python_visible_in_fuse(mount_dir, mounted_fs):
     """Test that symlinks created in Python are visible through FUSE."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    fs.create_file("/target.txt", b"content")
+    fs.create_file("/target.txt", _CONTENT)
     fs.symlink("/target.txt", "/link.txt")
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         link_path = os.path.join(mount_dir, "link.txt")
 
         assert os.path.islink(link_path)
@@ -579,16 +619,11 @@ def test_symlink_python_visible_in_fuse(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_statfs(mount_dir):
+def test_statfs(mount_dir, mounted_fs):
     """Test that statfs works (df command)."""
-    from pyrofs import MemFS
-
     fs = MemFS()
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         # os.statvfs should work
         stat = os.statvfs(mount_dir)
         assert stat.f_bsize > 0
@@ -597,16 +632,11 @@ def test_statfs(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_fsync(mount_dir):
+def test_fsync(mount_dir, mounted_fs):
     """Test that fsync works."""
-    from pyrofs import MemFS
-
     fs = MemFS()
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
-
+    with mounted_fs(fs, mount_dir):
         file_path = os.path.join(mount_dir, "syncme.txt")
 
         fd = os.open(file_path, os.O_CREAT | os.O_WRONLY)
@@ -616,17 +646,12 @@ def test_fsync(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_utimens(mount_dir):
+def test_utimens(mount_dir, mounted_fs):
     """Test that setting file times works."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    fs.create_file("/timed.txt", b"content")
-
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
+    fs.create_file("/timed.txt", _CONTENT)
 
+    with mounted_fs(fs, mount_dir):
         file_path = os.path.join(mount_dir, "timed.txt")
 
         # Set specific atime/mtime
@@ -637,11 +662,8 @@ def test_utimens(mount_dir):
         assert stat.st_mtime == 2000000
 
 
-def test_concurrent_access():
+def test_concurrent_access(thread_pool):
     """Test that multiple threads can access the filesystem."""
-    from pyrofs import MemFS
-    import threading
-
     fs = MemFS()
     fs.create_file("/shared.txt", b"initial")
 
@@ -649,139 +671,140 @@ def test_concurrent_access():
         f = fs.get("/shared.txt")
         f.write(content)
 
-    threads = [
-        threading.Thread(target=writer, args=(b"thread1",)),
-        threading.Thread(target=writer, args=(b"thread2",)),
-    ]
-
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
+    payloads = [f"thread{i}".encode() * 64 for i in range(_WORKERS * 4)]
+    for future in [thread_pool.submit(writer, p) for p in payloads]:
+        future.result()
 
-    # File should have one of the contents
+    # Every call completed; File.write replaces the contents in one step
+    # under the GIL, so this only checks that the last write is one of ours
+    # (torn writes would need concurrent FUSE writes at different offsets)
     f = fs.get("/shared.txt")
-    assert f.read() in [b"thread1", b"thread2"]
+    assert f.read() in payloads
 
 
 def test_large_file():
     """Test handling of larger files."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    # Create a 1MB file
-    large_content = b"x" * (1024 * 1024)
-    f = fs.create_file("/large.txt", large_content)
-    assert f.size == 1024 * 1024
-    assert f.read() == large_content
+    f = fs.create_file("/large.txt", _LARGE_1MB)
+    assert f.size == len(_LARGE_1MB)
+    assert f.read() == _LARGE_1MB
 
 
 def test_deep_directory_nesting():
     """Test deeply nested directories."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    # Create a very deep path
-    deep_path = "/" + "/".join(f"level{i}" for i in range(50))
-    fs.makedirs(deep_path)
-    assert fs.exists(deep_path)
+    fs.makedirs(_DEEP_PATH)
+    assert fs.exists(_DEEP_PATH)
 
 
 def test_many_files_in_directory():
     """Test directory with many files."""
-    from pyrofs import MemFS
+    fs = MemFS()
+    for path, content in _MANY:
+        fs.create_file(path, content)
+
+    assert len(fs.get("/")) == len(_MANY)
+
 
+def test_directory_len():
+    """Test that a directory's length follows its children."""
     fs = MemFS()
-    # Create 1000 files
-    for i in range(1000):
-        fs.create_file(f"/file{i}.txt", f"content{i}".encode())
+    root = fs.get("/")
+    assert len(root) == 0
+    assert root  # empty directories are still truthy
 
-    contents = fs.listdir("/")
-    assert len(contents) == 1000
+    fs.create_dir("/sub")
+    fs.create_file("/a.txt")
+    fs.create_file("/b.txt")
+    assert len(root) == 3
 
+    fs.remove_file("/a.txt")
+    assert len(root) == 2
 
-def test_rename_to_existing_directory_fails():
-    """Test that renaming file to existing directory fails."""
-    from pyrofs import MemFS
+    fs.rename("/b.txt", "/sub/b.txt")
+    assert len(root) == 1
+    assert len(fs.get("/sub")) == 1
 
+
+def test_directory_past_promotion():
+    """Test lookups and removal once a directory outgrows its small form."""
     fs = MemFS()
-    fs.create_file("/file.txt", b"content")
-    fs.create_dir("/dir")
-    with pytest.raises(ValueError, match="directory"):
-        fs.rename("/file.txt", "/dir")
+    fs.create_dir("/d")
+    names = [f"f{i:02}.txt" for i in range(40)]
+    for name in names:
+        fs.create_file(f"/d/{name}", name.encode())
 
+    for name in (names[0], names[20], names[-1]):
+        assert fs.exists(f"/d/{name}")
+        assert fs.get(f"/d/{name}").read() == name.encode()
 
-def test_symlink_broken():
-    """Test broken symlink (target doesn't exist)."""
-    from pyrofs import MemFS
+    fs.remove_file("/d/f05.txt")
+    _assert_state(fs, present=["/d/f04.txt", "/d/f06.txt"], absent=["/d/f05.txt"])
+    assert set(fs.listdir("/d")) == set(names) - {"f05.txt"}
 
-    fs = MemFS()
-    # Create symlink to non-existent target
-    link = fs.symlink("/nonexistent.txt", "/broken.txt")
-    assert fs.is_symlink("/broken.txt")
-    assert fs.readlink("/broken.txt") == "/nonexistent.txt"
 
+def test_rename_to_existing_directory_fails():
+    """Test that renaming file to existing directory fails."""
+    fs = MemFS()
+    fs.create_file("/file.txt", _CONTENT)
+    fs.create_dir("/dir")
+    with pytest.raises(ValueError, match=_DIRECTORY):
+        fs.rename("/file.txt", "/dir")
 
-def test_symlink_chain():
-    """Test chain of symlinks."""
-    from pyrofs import MemFS
 
+@pytest.mark.parametrize(
+    "links",
+    [
+        {"/broken.txt": "/nonexistent.txt"},
+        {"/link1.txt": "/target.txt", "/link2.txt": "/link1.txt"},
+    ],
+    ids=["broken", "chain"],
+)
+def test_symlink_targets(links):
+    """Test that symlinks keep their targets verbatim, dangling or chained."""
     fs = MemFS()
     fs.create_file("/target.txt", b"final content")
-    fs.symlink("/target.txt", "/link1.txt")
-    fs.symlink("/link1.txt", "/link2.txt")
-    assert fs.readlink("/link1.txt") == "/target.txt"
-    assert fs.readlink("/link2.txt") == "/link1.txt"
+    for path, target in links.items():
+        fs.symlink(target, path)
 
+    for path, target in links.items():
+        assert fs.is_symlink(path)
+        assert fs.readlink(path) == target
 
-def test_path_with_special_characters():
-    """Test files with special characters in names."""
-    from pyrofs import MemFS
 
+@pytest.mark.parametrize(
+    "name", ["file with spaces.txt", "file-with-dashes.txt", "file_with_underscores.txt"]
+)
+def test_path_with_special_characters(name):
+    """Test files with special characters in names."""
     fs = MemFS()
-    # Test various special characters
-    names = [
-        "file with spaces.txt",
-        "file-with-dashes.txt",
-        "file_with_underscores.txt",
-    ]
-    for name in names:
-        fs.create_file(f"/{name}", b"content")
-        assert fs.exists(f"/{name}")
+    fs.create_file(f"/{name}", _CONTENT)
+    assert fs.exists(f"/{name}")
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_multiple_sequential_mounts(mount_dir):
+def test_multiple_sequential_mounts(mount_dir, mounted_fs):
     """Test mounting, unmounting, and remounting the same filesystem."""
-    from pyrofs import MemFS
-
     fs = MemFS()
     fs.create_file("/persistent.txt", b"data")
 
     # First mount
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
+    with mounted_fs(fs, mount_dir):
         assert os.path.exists(os.path.join(mount_dir, "persistent.txt"))
 
     # Second mount - data should still be there
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
+    with mounted_fs(fs, mount_dir):
         with open(os.path.join(mount_dir, "persistent.txt"), "rb") as f:
             assert f.read() == b"data"
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_remove_through_fuse(mount_dir):
+def test_remove_through_fuse(mount_dir, mounted_fs):
     """Test removing files through FUSE."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    fs.create_file("/removeme.txt", b"content")
+    fs.create_file("/removeme.txt", _CONTENT)
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
+    with mounted_fs(fs, mount_dir):
         file_path = os.path.join(mount_dir, "removeme.txt")
         os.remove(file_path)
 
@@ -790,16 +813,12 @@ def test_remove_through_fuse(mount_dir):
 
 
 @pytest.mark.fuse
-@pytest.mark.skipif(not os.path.exists("/dev/fuse"), reason="FUSE not available")
-def test_chmod_through_fuse(mount_dir):
+def test_chmod_through_fuse(mount_dir, mounted_fs):
     """Test changing permissions through FUSE."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    fs.create_file("/perms.txt", b"content", mode=0o644)
+    fs.create_file("/perms.txt", _CONTENT, mode=0o644)
 
-    with fs.mount(mount_dir, allow_other=False):
-        time.sleep(0.1)
+    with mounted_fs(fs, mount_dir):
         file_path = os.path.join(mount_dir, "perms.txt")
 
         # Change permissions
@@ -812,10 +831,8 @@ def test_chmod_through_fuse(mount_dir):
 
 def test_file_read_write_offset():
     """Test that file operations maintain content correctly."""
-    from pyrofs import MemFS
-
     fs = MemFS()
-    f = fs.create_file("/offset.txt", b"Hello, World!")
+    f = fs.create_file("/offset.txt", _HELLO)
 
     # Multiple writes should replace content
     f.write(b"Hi")
@@ -823,22 +840,14 @@ def test_file_read_write_offset():
     assert f.size == 2
 
 
-def test_root_is_directory():
+def test_root_is_directory(ro_fs):
     """Test that root behaves like a directory."""
-    from pyrofs import MemFS, Directory
-
-    fs = MemFS()
-    root = fs.root
+    root = ro_fs.root
     assert isinstance(root, Directory)
     assert root.name == ""
 
 
-def test_empty_path_handling():
+def test_empty_path_handling(ro_fs):
     """Test handling of empty and root paths."""
-    from pyrofs import MemFS
-
-    fs = MemFS()
-
     # These should all refer to root
-    assert fs.exists("/")
-    assert fs.exists("")
+    _assert_state(ro_fs, present=["/", ""])